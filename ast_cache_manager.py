@@ -3,16 +3,96 @@ Dynamic AST Cache Manager
 Maintains AST trees as JSON files for each project without database dependency
 """
 
-import json
 import os
 import hashlib
+import multiprocessing
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional, Union, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
-@dataclass
+import orjson
+
+# BLAKE3 is optional; hashlib's BLAKE2b is the fallback for content hashing
+try:
+    from blake3 import blake3 as _content_hasher
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    def _content_hasher(data: bytes = b""):
+        return hashlib.blake2b(data, digest_size=16)
+    BLAKE3_AVAILABLE = False
+
+# zstandard is optional; without it AST blobs are stored as plain JSON
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+ZSTD_LEVEL = 3
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Source content may be passed as text, raw bytes, or a path to the file on disk
+SourceContent = Union[str, bytes, os.PathLike]
+
+def _read_source(content: SourceContent) -> str:
+    """Decode source content to text for the parser"""
+    if isinstance(content, os.PathLike):
+        return Path(content).read_text(encoding='utf-8')
+    if isinstance(content, bytes):
+        return content.decode('utf-8')
+    return content
+
+# Per-process parser for bulk_parse_and_cache; built once by the pool initializer
+_worker_processor = None
+
+def _init_parse_worker(processor_cls):
+    global _worker_processor
+    _worker_processor = processor_cls()
+
+def _parse_in_worker(file_path: str, content: SourceContent) -> Tuple[str, Dict]:
+    language = _worker_processor.detect_language(file_path)
+    return file_path, _worker_processor.parse_code(_read_source(content), language)
+
+# Shared parse pool, kept alive between refreshes and rebuilt only if the processor type changes
+_parse_pool = None
+_parse_pool_processor = None
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool(processor_cls) -> ProcessPoolExecutor:
+    """Return the parse worker pool for processor_cls, creating it on first use"""
+    global _parse_pool, _parse_pool_processor
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_processor is not processor_cls:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            # Workers come from a clean forkserver (or spawn) process, never from forking
+            # the threaded server, so they can't inherit a lock held by another thread
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_init_parse_worker,
+                initargs=(processor_cls,)
+            )
+            _parse_pool_processor = processor_cls
+        return _parse_pool
+
+def shutdown_parse_pool():
+    """Stop the parse worker pool; called on app shutdown"""
+    global _parse_pool, _parse_pool_processor
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=True, cancel_futures=True)
+            _parse_pool = None
+            _parse_pool_processor = None
+
+@dataclass(slots=True)
 class ASTNodeInfo:
     """Represents a parsed AST node"""
     name: str
@@ -29,8 +109,10 @@ class ASTNodeInfo:
     docstring: Optional[str] = None
     scope: str = "global"
     file_path: str = ""
+    name_lower: str = field(default="", repr=False, compare=False)  # derived from name
     
     def __post_init__(self):
+        self.name_lower = self.name.lower()
         if self.parameters is None:
             self.parameters = []
         if self.methods is None:
@@ -39,8 +121,28 @@ class ASTNodeInfo:
             self.inheritance = []
         if self.decorators is None:
             self.decorators = []
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dictionary (cheaper than dataclasses.asdict)"""
+        return {
+            "name": self.name,
+            "type": self.type,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+            "start_byte": self.start_byte,
+            "end_byte": self.end_byte,
+            "parameters": list(self.parameters),
+            "methods": list(self.methods),
+            "inheritance": list(self.inheritance),
+            "decorators": list(self.decorators),
+            "is_async": self.is_async,
+            "docstring": self.docstring,
+            "scope": self.scope,
+            "file_path": self.file_path,
+            "name_lower": self.name_lower
+        }
 
-@dataclass 
+@dataclass(slots=True)
 class FileASTInfo:
     """Represents AST information for a single file"""
     file_path: str
@@ -66,11 +168,33 @@ class FileASTInfo:
             self.imports = []
         if not self.variables:
             self.variables = []
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dictionary, including nested nodes"""
+        return {
+            "file_path": self.file_path,
+            "language": self.language,
+            "file_hash": self.file_hash,
+            "last_modified": self.last_modified,
+            "last_parsed": self.last_parsed,
+            "functions": [f.to_dict() for f in self.functions],
+            "classes": [c.to_dict() for c in self.classes],
+            "imports": [i.to_dict() for i in self.imports],
+            "variables": [v.to_dict() for v in self.variables],
+            "total_lines": self.total_lines,
+            "complexity_score": self.complexity_score,
+            "has_syntax_errors": self.has_syntax_errors,
+            "parser_type": self.parser_type
+        }
+
+# Maximum number of parsed files kept in memory per project
+MEMORY_CACHE_SIZE = 512
 
 class ProjectASTCache:
     """Manages AST cache for a single project"""
     
-    def __init__(self, project_id: str, project_name: str, base_cache_dir: str = "ast_cache"):
+    def __init__(self, project_id: str, project_name: str, base_cache_dir: str = "ast_cache",
+                 memory_cache_size: int = MEMORY_CACHE_SIZE):
         self.project_id = project_id
         self.project_name = project_name
         self.base_cache_dir = Path(base_cache_dir)
@@ -85,67 +209,104 @@ class ProjectASTCache:
         self.files_cache_dir = self.project_cache_dir / "files"
         self.files_cache_dir.mkdir(exist_ok=True)
         
-        # In-memory cache
-        self._memory_cache: Dict[str, FileASTInfo] = {}
+        # In-memory LRU cache of parsed files
+        self._memory_cache: "OrderedDict[str, FileASTInfo]" = OrderedDict()
+        self._memory_cache_size = memory_cache_size
         self._index_cache: Dict[str, Dict] = {}
         
+        # Inverted index: lowercased element name -> {file_path: [element rows]}
+        self._name_index: Dict[str, Dict[str, List[List[Any]]]] = {}
+        # Trigram index over the distinct names above, for substring queries
+        self._name_trigrams: Dict[str, set] = {}
+        
+        # Deferred index writes (see bulk_cache)
+        self._bulk_depth = 0
+        self._index_dirty = False
+        
         # Load existing cache
         self._load_index()
+        self._rebuild_name_index()
     
     def _load_index(self):
         """Load the AST index from disk"""
         if self.index_file.exists():
             try:
-                with open(self.index_file, 'r') as f:
-                    self._index_cache = json.load(f)
+                self._index_cache = orjson.loads(self.index_file.read_bytes())
             except Exception as e:
                 print(f"[DEBUG] Error loading AST index: {e}")
                 self._index_cache = {}
     
     def _save_index(self):
-        """Save the AST index to disk"""
+        """Save the AST index to disk (deferred while inside bulk_cache)"""
+        if self._bulk_depth:
+            self._index_dirty = True
+            return
+        
         try:
-            with open(self.index_file, 'w') as f:
-                json.dump(self._index_cache, f, indent=2)
+            # Write to a temp file and swap it in so a crash never leaves a truncated index
+            tmp_file = self.index_file.with_name(self.index_file.name + ".tmp")
+            with open(tmp_file, 'wb') as f:
+                # Compact output: the index is machine-read and rewritten on every cache update
+                f.write(orjson.dumps(self._index_cache))
+            os.replace(tmp_file, self.index_file)
+            self._index_dirty = False
         except Exception as e:
             print(f"[DEBUG] Error saving AST index: {e}")
     
-    def _get_file_hash(self, file_path: str, content: str) -> str:
+    @contextmanager
+    def bulk_cache(self):
+        """Batch many cache updates into a single index write on exit"""
+        self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            self._bulk_depth -= 1
+            if not self._bulk_depth and self._index_dirty:
+                self._save_index()
+    
+    def _get_file_hash(self, file_path: str, content: SourceContent) -> str:
         """Generate hash for file content"""
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        if isinstance(content, os.PathLike):
+            return self._get_path_hash(content)
+        data = content if isinstance(content, bytes) else content.encode('utf-8')
+        return _content_hasher(data).hexdigest()
+    
+    def _get_path_hash(self, path: os.PathLike) -> str:
+        """Hash a file straight from disk, without reading it into a str first"""
+        with open(path, 'rb') as f:
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                return hashlib.file_digest(f, _content_hasher).hexdigest()
+            hasher = _content_hasher()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+            return hasher.hexdigest()
     
     def _get_cache_filename(self, file_path: str) -> str:
         """Generate cache filename for a source file"""
-        # Use hash of file path to avoid filesystem issues
-        path_hash = hashlib.md5(file_path.encode('utf-8')).hexdigest()
-        return f"{path_hash}.json"
+        # Use hash of file path to avoid filesystem issues; 64 bits is plenty for path names
+        path_hash = hashlib.blake2b(file_path.encode('utf-8'), digest_size=8).hexdigest()
+        return f"{path_hash}.json.zst" if ZSTD_AVAILABLE else f"{path_hash}.json"
+    
+    @staticmethod
+    def _encode_blob(file_ast: FileASTInfo) -> bytes:
+        """Serialize a FileASTInfo for disk, zstd-compressed when available"""
+        if ZSTD_AVAILABLE:
+            return zstandard.compress(orjson.dumps(file_ast), ZSTD_LEVEL)
+        return orjson.dumps(file_ast, option=orjson.OPT_INDENT_2)
     
-    def _ast_node_to_dict(self, node: ASTNodeInfo) -> Dict:
-        """Convert ASTNodeInfo to dictionary"""
-        return asdict(node)
+    @staticmethod
+    def _decode_blob(data: bytes) -> Dict[str, Any]:
+        """Decode a cached blob, accepting both compressed and plain JSON files"""
+        if data[:4] == _ZSTD_MAGIC:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("blob is zstd-compressed but zstandard is not installed")
+            data = zstandard.decompress(data)
+        return orjson.loads(data)
     
     def _dict_to_ast_node(self, data: Dict) -> ASTNodeInfo:
         """Convert dictionary to ASTNodeInfo"""
         return ASTNodeInfo(**data)
     
-    def _file_ast_to_dict(self, file_ast: FileASTInfo) -> Dict:
-        """Convert FileASTInfo to dictionary for JSON storage"""
-        return {
-            "file_path": file_ast.file_path,
-            "language": file_ast.language,
-            "file_hash": file_ast.file_hash,
-            "last_modified": file_ast.last_modified,
-            "last_parsed": file_ast.last_parsed,
-            "functions": [self._ast_node_to_dict(f) for f in file_ast.functions],
-            "classes": [self._ast_node_to_dict(c) for c in file_ast.classes],
-            "imports": [self._ast_node_to_dict(i) for i in file_ast.imports],
-            "variables": [self._ast_node_to_dict(v) for v in file_ast.variables],
-            "total_lines": file_ast.total_lines,
-            "complexity_score": file_ast.complexity_score,
-            "has_syntax_errors": file_ast.has_syntax_errors,
-            "parser_type": file_ast.parser_type
-        }
-    
     def _dict_to_file_ast(self, data: Dict) -> FileASTInfo:
         """Convert dictionary to FileASTInfo"""
         return FileASTInfo(
@@ -164,65 +325,139 @@ class ProjectASTCache:
             parser_type=data.get("parser_type", "unknown")
         )
     
-    def _convert_ast_result_to_file_ast(self, file_path: str, content: str, ast_result: Dict) -> FileASTInfo:
+    def _build_element_listing(self, file_ast: FileASTInfo) -> List[List[Any]]:
+        """Compact [type, name, start_line, end_line, position] rows for the index"""
+        listing = [
+            ["function", func.name, func.start_line, func.end_line, position]
+            for position, func in enumerate(file_ast.functions)
+        ]
+        listing.extend(
+            ["class", cls.name, cls.start_line, cls.end_line, position]
+            for position, cls in enumerate(file_ast.classes)
+        )
+        return listing
+    
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    def _add_to_name_index(self, file_path: str, elements: List[List[Any]]):
+        """Register a file's element rows in the inverted name index"""
+        for row in elements:
+            key = row[1].lower()
+            postings = self._name_index.get(key)
+            if postings is None:
+                postings = self._name_index[key] = {}
+                for trigram in self._trigrams(key):
+                    self._name_trigrams.setdefault(trigram, set()).add(key)
+            postings.setdefault(file_path, []).append(row)
+    
+    def _remove_from_name_index(self, file_path: str):
+        """Drop a file's element rows from the inverted name index"""
+        index_info = self._index_cache.get(file_path)
+        if not index_info:
+            return
+        for row in index_info.get("elements", []):
+            key = row[1].lower()
+            postings = self._name_index.get(key)
+            if postings is None:
+                continue
+            postings.pop(file_path, None)
+            if not postings:
+                del self._name_index[key]
+                for trigram in self._trigrams(key):
+                    keys = self._name_trigrams.get(trigram)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self._name_trigrams[trigram]
+    
+    def _names_containing(self, name_lower: str) -> List[str]:
+        """Distinct indexed names that contain name_lower as a substring"""
+        trigrams = self._trigrams(name_lower)
+        if not trigrams:
+            # Queries shorter than a trigram cannot use the index
+            return [key for key in self._name_index if name_lower in key]
+        
+        # Intersect posting sets smallest-first, then verify the candidates
+        posting_sets = sorted((self._name_trigrams.get(t, set()) for t in trigrams), key=len)
+        candidates = set(posting_sets[0])
+        for keys in posting_sets[1:]:
+            if not candidates:
+                break
+            candidates &= keys
+        return [key for key in candidates if name_lower in key]
+    
+    def _build_index_stats(self, file_ast: FileASTInfo) -> Dict[str, Any]:
+        """Per-file counts kept in the index so summaries never load blobs"""
+        return {
+            "num_functions": len(file_ast.functions),
+            "num_classes": len(file_ast.classes),
+            "total_lines": file_ast.total_lines,
+            "complexity_score": file_ast.complexity_score
+        }
+    
+    def _rebuild_name_index(self):
+        """Build the inverted name index from the loaded AST index"""
+        self._name_index = {}
+        self._name_trigrams = {}
+        
+        # Index entries written by older versions lack element listings/stats
+        stale = [
+            file_path for file_path, index_info in self._index_cache.items()
+            if "elements" not in index_info or "num_functions" not in index_info
+        ]
+        for file_path, file_ast in self.get_cached_asts(stale).items():
+            index_info = self._index_cache[file_path]
+            index_info["elements"] = self._build_element_listing(file_ast)
+            index_info.update(self._build_index_stats(file_ast))
+        
+        for file_path, index_info in self._index_cache.items():
+            self._add_to_name_index(file_path, index_info.get("elements", []))
+        
+        if stale:
+            self._save_index()
+    
+    def _convert_ast_result_to_file_ast(self, file_path: str, content: SourceContent, ast_result: Dict) -> FileASTInfo:
         """Convert AST processor result to FileASTInfo"""
         
+        # Positional construction in ASTNodeInfo field order: name, type,
+        # start_line, end_line, start_byte, end_byte, parameters, methods,
+        # inheritance, decorators, is_async, docstring, scope, file_path
+        node = ASTNodeInfo
+        
         # Convert functions
-        functions = []
-        for func_data in ast_result.get("functions", []):
-            functions.append(ASTNodeInfo(
-                name=func_data.get("name", ""),
-                type="function",
-                start_line=func_data.get("line", 0),
-                end_line=func_data.get("end_line", func_data.get("line", 0)),
-                start_byte=func_data.get("start_byte"),
-                end_byte=func_data.get("end_byte"),
-                parameters=func_data.get("args", func_data.get("parameters", [])),
-                is_async=func_data.get("is_async", False),
-                docstring=func_data.get("docstring"),
-                decorators=func_data.get("decorators", []),
-                file_path=file_path
-            ))
+        functions = [
+            node(d.get("name", ""), "function", d.get("line", 0), d.get("end_line", d.get("line", 0)),
+                 d.get("start_byte"), d.get("end_byte"), d.get("args", d.get("parameters", [])),
+                 None, None, d.get("decorators", []), d.get("is_async", False), d.get("docstring"),
+                 "global", file_path)
+            for d in ast_result.get("functions", [])
+        ]
         
         # Convert classes
-        classes = []
-        for class_data in ast_result.get("classes", []):
-            classes.append(ASTNodeInfo(
-                name=class_data.get("name", ""),
-                type="class",
-                start_line=class_data.get("line", 0),
-                end_line=class_data.get("end_line", class_data.get("line", 0)),
-                start_byte=class_data.get("start_byte"),
-                end_byte=class_data.get("end_byte"),
-                methods=[m.get("name", "") for m in class_data.get("methods", [])],
-                inheritance=class_data.get("bases", class_data.get("inheritance", [])),
-                docstring=class_data.get("docstring"),
-                decorators=class_data.get("decorators", []),
-                file_path=file_path
-            ))
+        classes = [
+            node(d.get("name", ""), "class", d.get("line", 0), d.get("end_line", d.get("line", 0)),
+                 d.get("start_byte"), d.get("end_byte"), None,
+                 [m.get("name", "") for m in d.get("methods", [])],
+                 d.get("bases", d.get("inheritance", [])), d.get("decorators", []), False,
+                 d.get("docstring"), "global", file_path)
+            for d in ast_result.get("classes", [])
+        ]
         
         # Convert imports
-        imports = []
-        for import_data in ast_result.get("imports", []):
-            imports.append(ASTNodeInfo(
-                name=import_data.get("module", ""),
-                type="import",
-                start_line=import_data.get("line", 0),
-                end_line=import_data.get("line", 0),
-                file_path=file_path
-            ))
+        imports = [
+            node(d.get("module", ""), "import", d.get("line", 0), d.get("line", 0),
+                 None, None, None, None, None, None, False, None, "global", file_path)
+            for d in ast_result.get("imports", [])
+        ]
         
         # Convert variables
-        variables = []
-        for var_data in ast_result.get("variables", [])[:20]:  # Limit variables
-            variables.append(ASTNodeInfo(
-                name=var_data.get("name", ""),
-                type="variable",
-                start_line=var_data.get("line", 0),
-                end_line=var_data.get("line", 0),
-                scope=var_data.get("scope", "global"),
-                file_path=file_path
-            ))
+        variables = [
+            node(d.get("name", ""), "variable", d.get("line", 0), d.get("line", 0),
+                 None, None, None, None, None, None, False, None, d.get("scope", "global"), file_path)
+            for d in ast_result.get("variables", [])[:20]  # Limit variables
+        ]
         
         return FileASTInfo(
             file_path=file_path,
@@ -240,71 +475,151 @@ class ProjectASTCache:
             parser_type=ast_result.get("parser_type", "unknown")
         )
     
-    def is_file_cached_and_valid(self, file_path: str, content: str) -> bool:
+    def _remember(self, file_path: str, file_ast: FileASTInfo):
+        """Add a parsed file to the memory cache, evicting the least recently used"""
+        self._memory_cache[file_path] = file_ast
+        self._memory_cache.move_to_end(file_path)
+        while len(self._memory_cache) > self._memory_cache_size:
+            self._memory_cache.popitem(last=False)
+    
+    def is_file_cached_and_valid(self, file_path: str, content: SourceContent) -> bool:
         """Check if file is cached and cache is still valid"""
-        file_hash = self._get_file_hash(file_path, content)
+        cached_info = self._index_cache.get(file_path)
+        if cached_info is None:
+            return False
         
-        # Check index first
-        if file_path in self._index_cache:
-            cached_info = self._index_cache[file_path]
-            if cached_info.get("file_hash") == file_hash:
+        # For on-disk sources, an unchanged mtime and size means unchanged content
+        if isinstance(content, os.PathLike) and "source_mtime_ns" in cached_info:
+            try:
+                st = os.stat(content)
+            except OSError:
+                return False
+            if (st.st_mtime_ns == cached_info["source_mtime_ns"]
+                    and st.st_size == cached_info.get("source_size")):
                 return True
         
-        return False
+        return cached_info.get("file_hash") == self._get_file_hash(file_path, content)
+    
+    def _load_cached_data_from_disk(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Read and decode a file's cached AST blob as a raw dict (no shared state touched)"""
+        index_info = self._index_cache.get(file_path)
+        if index_info is None:
+            return None
+        
+        # The index already records the blob name; only hash the path for old entries
+        cache_filename = index_info.get("cache_filename") or self._get_cache_filename(file_path)
+        cache_file_path = self.files_cache_dir / cache_filename
+        
+        try:
+            # One read syscall for the whole blob; a missing file is just a cache miss
+            return self._decode_blob(cache_file_path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[DEBUG] Error loading cached AST for {file_path}: {e}")
+            return None
+    
+    def _load_cached_ast_from_disk(self, file_path: str) -> Optional[FileASTInfo]:
+        """Read a file's cached AST blob and rehydrate it into a FileASTInfo"""
+        cached_data = self._load_cached_data_from_disk(file_path)
+        if cached_data is None:
+            return None
+        
+        try:
+            return self._dict_to_file_ast(cached_data)
+        except Exception as e:
+            print(f"[DEBUG] Error loading cached AST for {file_path}: {e}")
+            return None
+    
+    def _load_many(self, loader, file_paths: List[str]) -> List[Any]:
+        """Run a disk loader over many files, on worker threads when it pays off"""
+        if len(file_paths) > 1:
+            max_workers = min(len(file_paths), (os.cpu_count() or 1) * 2)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(loader, file_paths))
+        return [loader(file_path) for file_path in file_paths]
     
     def get_cached_ast(self, file_path: str) -> Optional[FileASTInfo]:
         """Get cached AST for a file"""
         
         # Check memory cache first
-        if file_path in self._memory_cache:
-            return self._memory_cache[file_path]
+        file_ast = self._memory_cache.get(file_path)
+        if file_ast is not None:
+            self._memory_cache.move_to_end(file_path)
+            return file_ast
         
         # Check disk cache
-        if file_path in self._index_cache:
-            cache_filename = self._get_cache_filename(file_path)
-            cache_file_path = self.files_cache_dir / cache_filename
-            
-            if cache_file_path.exists():
-                try:
-                    with open(cache_file_path, 'r') as f:
-                        cached_data = json.load(f)
-                    
-                    file_ast = self._dict_to_file_ast(cached_data)
-                    
-                    # Store in memory cache
-                    self._memory_cache[file_path] = file_ast
-                    
-                    return file_ast
-                    
-                except Exception as e:
-                    print(f"[DEBUG] Error loading cached AST for {file_path}: {e}")
-        
-        return None
-    
-    def cache_ast(self, file_path: str, content: str, ast_result: Dict):
+        file_ast = self._load_cached_ast_from_disk(file_path)
+        if file_ast is not None:
+            self._remember(file_path, file_ast)
+        
+        return file_ast
+    
+    def get_cached_asts(self, file_paths: List[str]) -> Dict[str, FileASTInfo]:
+        """Get cached ASTs for many files, loading memory-cache misses in parallel"""
+        
+        results: Dict[str, FileASTInfo] = {}
+        misses = []
+        for file_path in file_paths:
+            file_ast = self._memory_cache.get(file_path)
+            if file_ast is not None:
+                self._memory_cache.move_to_end(file_path)
+                results[file_path] = file_ast
+            else:
+                misses.append(file_path)
+        
+        # Disk reads and decoding run on worker threads; the memory cache is
+        # only updated from this thread
+        loaded = self._load_many(self._load_cached_ast_from_disk, misses)
+        
+        for file_path, file_ast in zip(misses, loaded):
+            if file_ast is not None:
+                self._remember(file_path, file_ast)
+                results[file_path] = file_ast
+        
+        # Preserve the caller's ordering
+        return {file_path: results[file_path] for file_path in file_paths if file_path in results}
+    
+    def cache_ast(self, file_path: str, content: SourceContent, ast_result: Dict):
         """Cache AST result for a file"""
         
         try:
+            # Stat before hashing so a concurrent edit can only make the entry look stale
+            source_stat = os.stat(content) if isinstance(content, os.PathLike) else None
+            
             # Convert to FileASTInfo
             file_ast = self._convert_ast_result_to_file_ast(file_path, content, ast_result)
             
             # Store in memory cache
-            self._memory_cache[file_path] = file_ast
+            self._remember(file_path, file_ast)
             
             # Store on disk
             cache_filename = self._get_cache_filename(file_path)
             cache_file_path = self.files_cache_dir / cache_filename
             
-            with open(cache_file_path, 'w') as f:
-                json.dump(self._file_ast_to_dict(file_ast), f, indent=2)
+            # orjson serializes the dataclasses (and nested nodes) natively
+            cache_file_path.write_bytes(self._encode_blob(file_ast))
+            
+            # Drop a blob left under the other extension if zstd availability changed
+            previous_filename = self._index_cache.get(file_path, {}).get("cache_filename")
+            if previous_filename and previous_filename != cache_filename:
+                (self.files_cache_dir / previous_filename).unlink(missing_ok=True)
             
             # Update index
+            self._remove_from_name_index(file_path)
             self._index_cache[file_path] = {
                 "file_hash": file_ast.file_hash,
                 "last_parsed": file_ast.last_parsed,
                 "cache_filename": cache_filename,
-                "language": file_ast.language
+                "language": file_ast.language,
+                "elements": self._build_element_listing(file_ast),
+                **self._build_index_stats(file_ast)
             }
+            if source_stat is not None:
+                self._index_cache[file_path]["source_mtime_ns"] = source_stat.st_mtime_ns
+                self._index_cache[file_path]["source_size"] = source_stat.st_size
+            
+            self._add_to_name_index(file_path, self._index_cache[file_path]["elements"])
             
             # Save index
             self._save_index()
@@ -314,7 +629,7 @@ class ProjectASTCache:
         except Exception as e:
             print(f"[DEBUG] Error caching AST for {file_path}: {e}")
     
-    def get_or_parse_ast(self, file_path: str, content: str, ast_processor) -> FileASTInfo:
+    def get_or_parse_ast(self, file_path: str, content: SourceContent, ast_processor) -> FileASTInfo:
         """Get AST from cache or parse and cache it"""
         
         # Check if cached and valid
@@ -327,7 +642,7 @@ class ProjectASTCache:
         # Parse and cache
         print(f"[DEBUG] Parsing AST for {file_path}")
         language = ast_processor.detect_language(file_path)
-        ast_result = ast_processor.parse_code(content, language)
+        ast_result = ast_processor.parse_code(_read_source(content), language)
         
         # Cache the result
         self.cache_ast(file_path, content, ast_result)
@@ -335,6 +650,32 @@ class ProjectASTCache:
         # Return from cache
         return self.get_cached_ast(file_path)
     
+    def bulk_parse_and_cache(self, file_contents: Dict[str, SourceContent], ast_processor) -> Dict[str, FileASTInfo]:
+        """Parse every stale file in a process pool and cache the results"""
+        stale = {file_path: content for file_path, content in file_contents.items()
+                 if not self.is_file_cached_and_valid(file_path, content)}
+        
+        with self.bulk_cache():
+            if len(stale) > 1:
+                # Each worker builds its own parser once; parsing runs outside this process's GIL
+                print(f"[DEBUG] Parsing {len(stale)} files in a process pool")
+                pool = _get_parse_pool(type(ast_processor))
+                futures = {pool.submit(_parse_in_worker, file_path, content): file_path
+                           for file_path, content in stale.items()}
+                for future, file_path in futures.items():
+                    try:
+                        _, ast_result = future.result()
+                    except Exception as e:
+                        print(f"[DEBUG] Error parsing AST for {file_path}: {e}")
+                        continue
+                    self.cache_ast(file_path, stale[file_path], ast_result)
+            else:
+                # Not worth starting a pool for a single file
+                for file_path, content in stale.items():
+                    self.get_or_parse_ast(file_path, content, ast_processor)
+        
+        return self.get_cached_asts(list(file_contents))
+    
     def get_project_ast_summary(self) -> Dict[str, Any]:
         """Get summary of all cached ASTs for the project"""
         
@@ -349,65 +690,82 @@ class ProjectASTCache:
             "files": []
         }
         
-        # Load all cached files
-        for file_path in self._index_cache.keys():
-            file_ast = self.get_cached_ast(file_path)
-            if file_ast:
-                # Update language counts
-                lang = file_ast.language
-                if lang not in summary["languages"]:
-                    summary["languages"][lang] = 0
-                summary["languages"][lang] += 1
-                
-                # Update totals
-                summary["total_functions"] += len(file_ast.functions)
-                summary["total_classes"] += len(file_ast.classes)
-                summary["total_lines"] += file_ast.total_lines
-                
-                # File info
-                summary["files"].append({
-                    "file_path": file_path,
-                    "language": file_ast.language,
-                    "functions": len(file_ast.functions),
-                    "classes": len(file_ast.classes),
-                    "lines": file_ast.total_lines,
-                    "complexity": file_ast.complexity_score
-                })
+        # Everything needed is in the index; no per-file blobs are loaded
+        languages = summary["languages"]
+        for file_path, index_info in self._index_cache.items():
+            lang = index_info.get("language", "unknown")
+            languages[lang] = languages.get(lang, 0) + 1
+            
+            num_functions = index_info.get("num_functions", 0)
+            num_classes = index_info.get("num_classes", 0)
+            total_lines = index_info.get("total_lines", 0)
+            
+            # Update totals
+            summary["total_functions"] += num_functions
+            summary["total_classes"] += num_classes
+            summary["total_lines"] += total_lines
+            
+            # File info
+            summary["files"].append({
+                "file_path": file_path,
+                "language": lang,
+                "functions": num_functions,
+                "classes": num_classes,
+                "lines": total_lines,
+                "complexity": index_info.get("complexity_score", 0)
+            })
         
         return summary
     
     def find_elements_by_name(self, name: str) -> List[Dict[str, Any]]:
         """Find all AST elements (functions, classes) by name across all files"""
         
-        results = []
         name_lower = name.lower()
         
-        for file_path in self._index_cache.keys():
-            file_ast = self.get_cached_ast(file_path)
-            if file_ast:
-                # Check functions
-                for func in file_ast.functions:
-                    if name_lower in func.name.lower():
-                        results.append({
-                            "type": "function",
-                            "name": func.name,
-                            "file_path": file_path,
-                            "line": func.start_line,
-                            "end_line": func.end_line,
-                            "element": func
-                        })
-                
-                # Check classes
-                for cls in file_ast.classes:
-                    if name_lower in cls.name.lower():
-                        results.append({
-                            "type": "class",
-                            "name": cls.name,
-                            "file_path": file_path,
-                            "line": cls.start_line,
-                            "end_line": cls.end_line,
-                            "element": cls
-                        })
+        # Substring match over distinct names via the trigram index, grouping hits by file
+        matches_by_file: Dict[str, List[List[Any]]] = {}
+        for key in self._names_containing(name_lower):
+            for file_path, rows in self._name_index[key].items():
+                matches_by_file.setdefault(file_path, []).extend(rows)
+        # Report files in cache index order, as the full scan did, not name-set order
+        matches_by_file = {file_path: matches_by_file[file_path]
+                           for file_path in self._index_cache if file_path in matches_by_file}
+        
+        # Files already in memory reuse their nodes; others are read as raw
+        # dicts and only the matched nodes are rehydrated
+        in_memory = {}
+        misses = []
+        for file_path in matches_by_file:
+            file_ast = self._memory_cache.get(file_path)
+            if file_ast is not None:
+                in_memory[file_path] = file_ast
+            else:
+                misses.append(file_path)
+        raw_blobs = dict(zip(misses, self._load_many(self._load_cached_data_from_disk, misses)))
+        
+        results = []
+        for file_path, rows in matches_by_file.items():
+            file_ast = in_memory.get(file_path)
+            cached_data = raw_blobs.get(file_path)
+            if file_ast is None and cached_data is None:
+                continue
+            
+            # Functions before classes, in source order, as stored in the file AST
+            rows.sort(key=lambda row: (row[0] != "function", row[4]))
+            for element_type, element_name, start_line, end_line, position in rows:
+                group = "functions" if element_type == "function" else "classes"
+                if file_ast is not None:
+                    element = getattr(file_ast, group)[position]
+                else:
+                    element = self._dict_to_ast_node(cached_data[group][position])
+                results.append({
+                    "type": element_type,
+                    "name": element_name,
+                    "file_path": file_path,
+                    "line": start_line,
+                    "end_line": end_line,
+                    "element": element
+                })
         
         return results
     
@@ -422,9 +780,10 @@ class ProjectASTCache:
         
         # Get all functions and classes
         all_elements = file_ast.functions + file_ast.classes
+        name_lower = element_name.lower() if element_name is not None else None
         
         for element in all_elements:
-            if element_name is None or element_name.lower() in element.name.lower():
+            if name_lower is None or name_lower in element.name_lower:
                 results.append({
                     "type": element.type,
                     "name": element.name,
@@ -436,12 +795,20 @@ class ProjectASTCache:
         
         return results
     
+    def invalidate_file(self, file_path: str):
+        """Forget a file so the next lookup re-parses it"""
+        self._remove_from_name_index(file_path)
+        self._index_cache.pop(file_path, None)
+        self._memory_cache.pop(file_path, None)
+    
     def clear_cache(self):
         """Clear all cached AST data"""
         try:
             # Clear memory cache
             self._memory_cache.clear()
             self._index_cache.clear()
+            self._name_index.clear()
+            self._name_trigrams.clear()
             
             # Remove cache files
             if self.project_cache_dir.exists():
@@ -472,12 +839,8 @@ class ProjectASTCache:
                 if cache_file_path.exists():
                     cache_file_path.unlink()
             
-            # Remove from index
-            del self._index_cache[file_path]
-            
-            # Remove from memory
-            if file_path in self._memory_cache:
-                del self._memory_cache[file_path]
+            # Remove from indexes and memory
+            self.invalidate_file(file_path)
         
         if files_to_remove:
             self._save_index()
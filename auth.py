@@ -1,89 +1,271 @@
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+import base64
+import calendar
+import hashlib
+import hmac
+import multiprocessing
+import os
+import queue
 import secrets
+import struct
+import threading
+import time
+from mysql.connector import IntegrityError
 from database import get_db_connection
+# Re-exported: the hashing functions live apart so pool workers import only bcrypt
+from password_hashing import BCRYPT_ROUNDS, BCRYPT_MAX_PASSWORD_BYTES, hash_password, verify_password
 
 RESET_TOKEN_EXPIRE_HOURS = 1
+_RESET_TOKEN_DELTA = timedelta(hours=RESET_TOKEN_EXPIRE_HOURS)
+RESET_TOKEN_BYTES = 32
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# MySQL error code for a UNIQUE key violation
+ER_DUP_ENTRY = 1062
 
-# JWT settings
+# SQL used by the auth paths
+_SQL_INSERT_USER = "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)"
+_SQL_FIND_USER_BY_EMAIL = "SELECT id, name, email, password_hash, is_active FROM users WHERE email = %s"
+_SQL_FIND_ACTIVE_USER = "SELECT id, name, email FROM users WHERE id = %s AND is_active = TRUE"
+_SQL_SET_PASSWORD = "UPDATE users SET password_hash = %s WHERE id = %s"
+_SQL_TOUCH_LAST_LOGIN = "UPDATE users SET last_login = NOW() WHERE id IN ({placeholders})"
+_SQL_FIND_RESET_TOKEN = "SELECT user_id, expires_at, used FROM password_reset_tokens WHERE token = %s"
+_SQL_USE_RESET_TOKEN = "UPDATE password_reset_tokens SET used = TRUE WHERE token = %s"
+_SQL_CREATE_RESET_TOKEN = "CALL create_reset_token(%s, %s, %s)"
+
+# Reset tokens are cut from a buffer refilled 4 KiB at a time, one getrandom call per ~128 tokens
+ENTROPY_BUFFER_BYTES = 4096
+
+_entropy = bytearray()
+_entropy_lock = threading.Lock()
+# A forked worker must never hand out the same bytes as its parent
+os.register_at_fork(after_in_child=_entropy.clear)
+
+# bcrypt runs in worker processes so concurrent logins use every core
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 1))
+
+_bcrypt_pool = None
+_bcrypt_pool_lock = threading.Lock()
+
+# last_login is written off the login path, batched by a background thread
+LAST_LOGIN_FLUSH_SECONDS = 0.1
+
+_last_login_queue: "queue.Queue[int]" = queue.Queue()
+_last_login_thread = None
+_last_login_lock = threading.Lock()
+
+# Session token settings
 SECRET_KEY = secrets.token_urlsafe(32)  # Generate a random secret key
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
+_ACCESS_TOKEN_SECONDS = int(timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS).total_seconds())
+
+# Session tokens are base64url(user_id, exp packed as "<IQ" + HMAC-SHA256 tag). The
+# HMAC key pads are computed once and copied per token instead of on every call.
+_SESSION_TOKEN_BODY = struct.Struct("<IQ")
+_SESSION_TOKEN_BYTES = _SESSION_TOKEN_BODY.size + hashlib.sha256().digest_size
+_HMAC_PROTOTYPE = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+# In-process cache for per-request user lookups (password checks are never cached)
+USER_CACHE_SIZE = 50_000
+USER_CACHE_TTL_SECONDS = 30
+
+
+class _TTLCache:
+    """Thread-safe, size-bounded cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: Optional[float] = None):
+        """Store a value; expires_at (epoch seconds) can shorten the TTL"""
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_user_cache = _TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
 
-def hash_password(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Create a JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+def _random_bytes(n: int) -> bytes:
+    """Take n bytes of OS randomness from the shared buffer"""
+    with _entropy_lock:
+        if len(_entropy) < n:
+            _entropy.extend(os.urandom(max(n, ENTROPY_BUFFER_BYTES)))
+        chunk = bytes(_entropy[:n])
+        del _entropy[:n]
+    return chunk
+
+def _hash_reset_token(token: str) -> bytes:
+    """Reset tokens are stored and looked up by SHA-256 digest, never in plaintext"""
+    return hashlib.sha256(token.encode()).digest()
+
+def _get_bcrypt_pool() -> ProcessPoolExecutor:
+    """Return the bcrypt worker pool, creating it if start_bcrypt_pool has not run"""
+    global _bcrypt_pool
+    if _bcrypt_pool is None:
+        with _bcrypt_pool_lock:
+            if _bcrypt_pool is None:
+                # Workers come from a clean forkserver (or spawn) process, never from forking
+                # this threaded server, so they can't inherit a lock held by another thread
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _bcrypt_pool = ProcessPoolExecutor(
+                    max_workers=BCRYPT_WORKERS,
+                    mp_context=multiprocessing.get_context(method)
+                )
+    return _bcrypt_pool
+
+def start_bcrypt_pool():
+    """Create the bcrypt pool and start a worker at app startup, off the first login"""
+    _get_bcrypt_pool().submit(int).result()
+
+def shutdown_bcrypt_pool():
+    """Stop the bcrypt workers"""
+    global _bcrypt_pool
+    with _bcrypt_pool_lock:
+        pool, _bcrypt_pool = _bcrypt_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+def _run_bcrypt(func, *args):
+    """Run hash_password/verify_password in the worker pool and wait for it"""
+    return _get_bcrypt_pool().submit(func, *args).result()
+
+def _flush_last_logins(user_ids: list):
+    """Stamp last_login for a batch of users in one statement"""
+    connection = get_db_connection()
+    if not connection:
+        print(f"Could not record last login for {len(user_ids)} user(s): no database connection")
+        return
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    try:
+        with closing(connection), closing(connection.cursor()) as cursor:
+            placeholders = ", ".join(["%s"] * len(user_ids))
+            cursor.execute(_SQL_TOUCH_LAST_LOGIN.format(placeholders=placeholders), tuple(user_ids))
+            connection.commit()
+    except Exception as e:
+        print(f"Error recording last login: {e}")
+
+def _last_login_writer():
+    """Drain the last_login queue, coalescing logins that arrive within a flush window"""
+    while True:
+        user_ids = {_last_login_queue.get()}
+        time.sleep(LAST_LOGIN_FLUSH_SECONDS)
+        while True:
+            try:
+                user_ids.add(_last_login_queue.get_nowait())
+            except queue.Empty:
+                break
+        _flush_last_logins(sorted(user_ids))
+
+def _record_last_login(user_id: int):
+    """Queue a last_login update, starting the writer thread on first use"""
+    global _last_login_thread
+    if _last_login_thread is None:
+        with _last_login_lock:
+            if _last_login_thread is None:
+                _last_login_thread = threading.Thread(
+                    target=_last_login_writer, name="last-login-writer", daemon=True
+                )
+                _last_login_thread.start()
+    _last_login_queue.put(user_id)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """Create a signed session token for data["user_id"]"""
+    # exp is kept in epoch seconds so no datetimes are built per token
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else _ACCESS_TOKEN_SECONDS
+    body = _SESSION_TOKEN_BODY.pack(data["user_id"], int(time.time()) + lifetime)
+    tag = _HMAC_PROTOTYPE.copy()
+    tag.update(body)
+    return _b64url(body + tag.digest()).decode("ascii")
 
 def verify_token(token: str) -> Optional[dict]:
-    """Verify a JWT token"""
+    """Verify a session token, returning its user_id and exp"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except ValueError:
+        return None
+    if len(raw) != _SESSION_TOKEN_BYTES:
         return None
 
+    body, tag = raw[:_SESSION_TOKEN_BODY.size], raw[_SESSION_TOKEN_BODY.size:]
+    expected = _HMAC_PROTOTYPE.copy()
+    expected.update(body)
+    if not hmac.compare_digest(tag, expected.digest()):
+        return None
+
+    user_id, exp = _SESSION_TOKEN_BODY.unpack(body)
+    if exp <= time.time():
+        return None
+    return {"user_id": user_id, "exp": exp}
+
 def create_user(name: str, email: str, password: str) -> dict:
     """Create a new user"""
+    # Hash while the connection is checked out; the two share no data
+    hash_future = _get_bcrypt_pool().submit(hash_password, password)
     connection = get_db_connection()
     if not connection:
+        hash_future.cancel()
         return {"success": False, "message": "Database connection failed"}
     
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Check if user already exists
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            return {"success": False, "message": "Email already registered"}
-        
-        # Hash password and create user
-        password_hash = hash_password(password)
-        cursor.execute(
-            "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
-            (name, email, password_hash)
-        )
-        connection.commit()
-        
-        user_id = cursor.lastrowid
-        
-        # Generate token
-        token = create_access_token({"user_id": user_id, "email": email})
-        
-        cursor.close()
-        connection.close()
-        
-        return {
-            "success": True,
-            "message": "User created successfully",
-            "token": token,
-            "user": {"id": user_id, "name": name, "email": email}
-        }
-        
+        with closing(connection), closing(connection.cursor()) as cursor:
+            # users.email is UNIQUE, so the INSERT itself detects duplicates
+            password_hash = hash_future.result()
+            try:
+                cursor.execute(_SQL_INSERT_USER, (name, email, password_hash))
+            except IntegrityError as e:
+                if e.errno == ER_DUP_ENTRY:
+                    return {"success": False, "message": "Email already registered"}
+                raise
+            connection.commit()
+            
+            user_id = cursor.lastrowid
     except Exception as e:
-        if connection:
-            connection.close()
         return {"success": False, "message": f"Error creating user: {str(e)}"}
+    
+    # Generate token
+    token = create_access_token({"user_id": user_id, "email": email})
+    
+    return {
+        "success": True,
+        "message": "User created successfully",
+        "token": token,
+        "user": {"id": user_id, "name": name, "email": email}
+    }
 
 def authenticate_user(email: str, password: str) -> dict:
     """Authenticate a user"""
@@ -92,48 +274,37 @@ def authenticate_user(email: str, password: str) -> dict:
         return {"success": False, "message": "Database connection failed"}
     
     try:
-        cursor = connection.cursor(dictionary=True)
+        # The connection goes back to the pool before the bcrypt check
+        with closing(connection), closing(connection.cursor()) as cursor:
+            cursor.execute(_SQL_FIND_USER_BY_EMAIL, (email,))
+            row = cursor.fetchone()
         
-        # Get user by email
-        cursor.execute(
-            "SELECT id, name, email, password_hash, is_active FROM users WHERE email = %s",
-            (email,)
-        )
-        user = cursor.fetchone()
-        
-        if not user:
+        if not row:
             return {"success": False, "message": "Invalid email or password"}
         
-        if not user['is_active']:
+        user_id, name, user_email, password_hash, is_active = row
+        
+        if not is_active:
             return {"success": False, "message": "Account is disabled"}
         
         # Verify password
-        if not verify_password(password, user['password_hash']):
+        if not _run_bcrypt(verify_password, password, password_hash):
             return {"success": False, "message": "Invalid email or password"}
         
-        # Update last login
-        cursor.execute(
-            "UPDATE users SET last_login = NOW() WHERE id = %s",
-            (user['id'],)
-        )
-        connection.commit()
+        # Update last login in the background; the login itself is a single SELECT
+        _record_last_login(user_id)
         
         # Generate token
-        token = create_access_token({"user_id": user['id'], "email": user['email']})
-        
-        cursor.close()
-        connection.close()
+        token = create_access_token({"user_id": user_id, "email": user_email})
         
         return {
             "success": True,
             "message": "Login successful",
             "token": token,
-            "user": {"id": user['id'], "name": user['name'], "email": user['email']}
+            "user": {"id": user_id, "name": name, "email": user_email}
         }
         
     except Exception as e:
-        if connection:
-            connection.close()
         return {"success": False, "message": f"Error authenticating user: {str(e)}"}
 
 def generate_reset_token(email: str) -> dict:
@@ -142,46 +313,31 @@ def generate_reset_token(email: str) -> dict:
     if not connection:
         return {"success": False, "message": "Database connection failed"}
 
-    try:
-        cursor = connection.cursor(dictionary=True)
-
-        cursor.execute("SELECT id FROM users WHERE email = %s AND is_active = TRUE", (email,))
-        user = cursor.fetchone()
-
-        if not user:
-            # Do not reveal whether the email exists
-            cursor.close()
-            connection.close()
-            return {"success": True, "message": "If that email is registered, a reset link has been sent."}
-
-        # Invalidate any existing unused tokens for this user
-        cursor.execute(
-            "UPDATE password_reset_tokens SET used = TRUE WHERE user_id = %s AND used = FALSE",
-            (user['id'],)
-        )
-
-        token = secrets.token_urlsafe(32)
-        expires_at = datetime.utcnow() + timedelta(hours=RESET_TOKEN_EXPIRE_HOURS)
-
-        cursor.execute(
-            "INSERT INTO password_reset_tokens (user_id, token, expires_at) VALUES (%s, %s, %s)",
-            (user['id'], token, expires_at)
-        )
-        connection.commit()
-        cursor.close()
-        connection.close()
-
-        return {
-            "success": True,
-            "message": "If that email is registered, a reset link has been sent.",
-            "reset_token": token  # used server-side for email dispatch
-        }
+    token = _b64url(_random_bytes(RESET_TOKEN_BYTES)).decode("ascii")
+    expires_at = datetime.now(timezone.utc) + _RESET_TOKEN_DELTA
 
+    try:
+        with closing(connection), closing(connection.cursor()) as cursor:
+            # One COM_QUERY: the procedure looks up the user, retires their unused tokens,
+            # inserts the new one and commits, then selects the user id (NULL if unknown)
+            params = (email, _hash_reset_token(token), expires_at)
+            user_id = None
+            for result in cursor.execute(_SQL_CREATE_RESET_TOKEN, params, multi=True):
+                if result.with_rows:
+                    user_id = result.fetchone()[0]
     except Exception as e:
-        if connection:
-            connection.close()
         return {"success": False, "message": f"Error generating reset token: {str(e)}"}
 
+    if user_id is None:
+        # Do not reveal whether the email exists
+        return {"success": True, "message": "If that email is registered, a reset link has been sent."}
+
+    return {
+        "success": True,
+        "message": "If that email is registered, a reset link has been sent.",
+        "reset_token": token  # used server-side for email dispatch
+    }
+
 
 def reset_password(token: str, new_password: str) -> dict:
     """Reset user password using a valid reset token"""
@@ -190,78 +346,68 @@ def reset_password(token: str, new_password: str) -> dict:
         return {"success": False, "message": "Database connection failed"}
 
     try:
-        cursor = connection.cursor(dictionary=True)
-
-        cursor.execute(
-            """SELECT prt.user_id, prt.expires_at, prt.used
-               FROM password_reset_tokens prt
-               WHERE prt.token = %s""",
-            (token,)
-        )
-        record = cursor.fetchone()
-
-        if not record:
-            cursor.close()
-            connection.close()
-            return {"success": False, "message": "Invalid or expired reset link."}
-
-        if record['used']:
-            cursor.close()
-            connection.close()
-            return {"success": False, "message": "This reset link has already been used."}
-
-        if datetime.utcnow() > record['expires_at']:
-            cursor.close()
-            connection.close()
-            return {"success": False, "message": "This reset link has expired. Please request a new one."}
-
-        if len(new_password) < 8:
-            cursor.close()
-            connection.close()
-            return {"success": False, "message": "Password must be at least 8 characters."}
-
-        password_hash = hash_password(new_password)
-        cursor.execute(
-            "UPDATE users SET password_hash = %s WHERE id = %s",
-            (password_hash, record['user_id'])
-        )
-        cursor.execute(
-            "UPDATE password_reset_tokens SET used = TRUE WHERE token = %s",
-            (token,)
-        )
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with closing(connection), closing(connection.cursor()) as cursor:
+            token_hash = _hash_reset_token(token)
+
+            cursor.execute(_SQL_FIND_RESET_TOKEN, (token_hash,))
+            record = cursor.fetchone()
+
+            if not record:
+                return {"success": False, "message": "Invalid or expired reset link."}
+
+            user_id, expires_at, used = record
+
+            if used:
+                return {"success": False, "message": "This reset link has already been used."}
+
+            # expires_at comes back as naive UTC; compare as epoch seconds
+            if time.time() > calendar.timegm(expires_at.timetuple()):
+                return {"success": False, "message": "This reset link has expired. Please request a new one."}
+
+            if len(new_password) < 8:
+                return {"success": False, "message": "Password must be at least 8 characters."}
+
+            password_hash = _run_bcrypt(hash_password, new_password)
+            cursor.execute(_SQL_SET_PASSWORD, (password_hash, user_id))
+            cursor.execute(_SQL_USE_RESET_TOKEN, (token_hash,))
+            connection.commit()
+
+        invalidate_user(user_id)
 
         return {"success": True, "message": "Password reset successfully. You can now sign in."}
 
     except Exception as e:
-        if connection:
-            connection.close()
         return {"success": False, "message": f"Error resetting password: {str(e)}"}
 
 
+def invalidate_user(user_id: int):
+    """Drop a user's cached row; call after any change to their account"""
+    _user_cache.pop(user_id)
+
 def get_user_from_token(token: str) -> Optional[dict]:
     """Get user info from JWT token"""
     payload = verify_token(token)
     if not payload:
         return None
     
+    user_id = payload.get('user_id')
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return dict(user)
+    
     connection = get_db_connection()
     if not connection:
         return None
     
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT id, name, email FROM users WHERE id = %s AND is_active = TRUE",
-            (payload.get('user_id'),)
-        )
-        user = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        return user
-    except Exception as e:
-        if connection:
-            connection.close()
-        return None
\ No newline at end of file
+        with closing(connection), closing(connection.cursor()) as cursor:
+            cursor.execute(_SQL_FIND_ACTIVE_USER, (user_id,))
+            row = cursor.fetchone()
+    except Exception:
+        return None
+    
+    if not row:
+        return None
+    user = {"id": row[0], "name": row[1], "email": row[2]}
+    _user_cache.set(user_id, dict(user))
+    return user
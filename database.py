@@ -1,21 +1,59 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import HAVE_CEXT, Error, PoolError, pooling
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 25))
+
+# Use the C extension for the wire protocol when the installed wheel ships it
+USE_PURE = not HAVE_CEXT
+if USE_PURE:
+    print("mysql-connector C extension not available, using the pure-Python protocol")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _connection_config():
+    """Connection settings shared by the pool and direct connections"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'database': os.getenv('DB_NAME', 'stackgpt_db'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'use_pure': USE_PURE,
+    }
+
+def _get_pool():
+    """Create the connection pool on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # mysql-connector refuses pool sizes above CNX_POOL_MAXSIZE (32)
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="genstack",
+                    pool_size=max(1, min(DB_POOL_SIZE, pooling.CNX_POOL_MAXSIZE)),
+                    pool_reset_session=True,
+                    **_connection_config()
+                )
+    return _pool
+
 def get_db_connection():
-    """Create and return a database connection"""
+    """Return a pooled database connection; close() hands it back to the pool"""
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'stackgpt_db'),
-            port=int(os.getenv('DB_PORT', 3306))
-        )
-        return connection
+        return _get_pool().get_connection()
+    except PoolError as e:
+        # Pool exhausted: fall back to a one-off connection rather than failing the request
+        print(f"Connection pool exhausted, connecting directly: {e}")
+        try:
+            return mysql.connector.connect(**_connection_config())
+        except Error as e:
+            print(f"Error connecting to MySQL: {e}")
+            return None
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
@@ -28,7 +66,8 @@ def create_database_and_tables():
             host=os.getenv('DB_HOST', 'localhost'),
             user=os.getenv('DB_USER', 'root'),
             password=os.getenv('DB_PASSWORD', ''),
-            port=int(os.getenv('DB_PORT', 3306))
+            port=int(os.getenv('DB_PORT', 3306)),
+            use_pure=USE_PURE
         )
         cursor = connection.cursor()
         
@@ -87,7 +126,7 @@ def create_database_and_tables():
             CREATE TABLE IF NOT EXISTS password_reset_tokens (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id INT NOT NULL,
-                token VARCHAR(255) UNIQUE NOT NULL,
+                token BINARY(32) UNIQUE NOT NULL,
                 expires_at TIMESTAMP NOT NULL,
                 used BOOLEAN DEFAULT FALSE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -96,6 +135,39 @@ def create_database_and_tables():
             )
         """)
 
+        # Reset tokens used to be stored in plaintext; they now hold SHA-256 digests.
+        # Outstanding plaintext tokens expire within the hour, so drop them and convert.
+        cursor.execute(
+            """SELECT DATA_TYPE FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'password_reset_tokens' AND COLUMN_NAME = 'token'""",
+            (db_name,)
+        )
+        token_column = cursor.fetchone()
+        if token_column and token_column[0] != 'binary':
+            cursor.execute("DELETE FROM password_reset_tokens")
+            cursor.execute("ALTER TABLE password_reset_tokens MODIFY token BINARY(32) NOT NULL")
+
+        # One round trip for generate_reset_token: find the user, retire old tokens, insert
+        # and commit, then return the user id
+        cursor.execute("DROP PROCEDURE IF EXISTS create_reset_token")
+        cursor.execute("""
+            CREATE PROCEDURE create_reset_token(
+                IN p_email VARCHAR(255), IN p_token BINARY(32), IN p_expires TIMESTAMP
+            )
+            BEGIN
+                DECLARE v_user_id INT DEFAULT NULL;
+                SELECT id INTO v_user_id FROM users WHERE email = p_email AND is_active = TRUE;
+                IF v_user_id IS NOT NULL THEN
+                    UPDATE password_reset_tokens SET used = TRUE
+                        WHERE user_id = v_user_id AND used = FALSE;
+                    INSERT INTO password_reset_tokens (user_id, token, expires_at)
+                        VALUES (v_user_id, p_token, p_expires);
+                END IF;
+                COMMIT;
+                SELECT v_user_id;
+            END
+        """)
+
         connection.commit()
         print("✅ Database and tables created successfully!")
         
@@ -105,5 +177,7 @@ def create_database_and_tables():
     except Error as e:
         print(f"❌ Error creating database/tables: {e}")
 
-# Initialize database on import
-create_database_and_tables()
\ No newline at end of file
+# Schema setup is an explicit step (python migrate.py) rather than a side effect of
+# every import; GENSTACK_RUN_MIGRATIONS=1 restores the old run-on-import behaviour
+if __name__ == "__main__" or os.getenv("GENSTACK_RUN_MIGRATIONS") == "1":
+    create_database_and_tables()
\ No newline at end of file
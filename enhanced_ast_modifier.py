@@ -3,29 +3,191 @@ Enhanced AST Modifier with Dynamic JSON Caching
 Uses cached AST trees stored as JSON for fast modifications
 """
 
+import queue
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Callable
-from ast_cache_manager import global_ast_cache, ASTNodeInfo, FileASTInfo
+from ast_cache_manager import global_ast_cache, ASTNodeInfo, FileASTInfo, _content_hasher
 from multiLanguageASTParser import MultiLanguageASTProcessor
 from services.llm_provider import stream_llm, get_prompt_suffix
 
+# Fenced code block in an LLM response
+_CODE_BLOCK_RE = re.compile(r'```(?:\w+)?\s*\n(.*?)\n```', re.DOTALL)
+
+# Modification categories, checked in priority order; keywords match as substrings
+_MODIFICATION_KEYWORDS = {
+    "add": ["add", "create", "new", "implement"],
+    "fix": ["fix", "bug", "error", "correct", "syntax"],
+    "update": ["update", "modify", "change", "improve"],
+    "remove": ["remove", "delete", "drop"],
+    "refactor": ["refactor", "restructure", "optimize"],
+}
+_MODIFICATION_PRIORITY = {mod_type: rank for rank, mod_type in enumerate(_MODIFICATION_KEYWORDS)}
+
+# One pass over the message: the zero-width lookahead tries every position, and at each
+# one the named group that matches is the highest-priority category starting there
+_MODIFICATION_TYPE_RE = re.compile('(?=' + '|'.join(
+    f"(?P<{mod_type}>{'|'.join(map(re.escape, keywords))})"
+    for mod_type, keywords in _MODIFICATION_KEYWORDS.items()
+) + ')')
+
+_SYNTAX_FIX_RE = re.compile(
+    r'syntax error|unexpected identifier|parse error|syntax|identifier|template literal|quote|bracket'
+)
+
+# Substrings that make an unfenced multi-line response count as code
+_CODE_INDICATORS = ('def ', 'function ', 'class ', '{', '}', 'import ', 'from ')
+
+_RETURN_OUTSIDE_FUNCTION = "return outside of function"
+
+# Concurrent LLM calls when several sections of one file are modified
+MAX_SECTION_WORKERS = 8
+
+# Parsed file versions whose derived targets and prompt contexts are kept in memory
+DERIVED_CACHE_SIZE = 256
+
+# Symbols listed in the general-modification prompt before truncating
+MAX_CONTEXT_FUNCTIONS = 40
+MAX_CONTEXT_CLASSES = 20
+
+# Element names that are language keywords rather than real targets
+_IGNORE_KEYWORDS: frozenset = frozenset({
+    'if', 'else', 'elif', 'for', 'while', 'do', 'switch', 'case', 'break',
+    'continue', 'return', 'try', 'catch', 'finally', 'throw', 'new', 'var',
+    'let', 'const', 'function', 'class', 'import', 'export', 'default'
+})
+
+# Mentioning functions/methods in general targets every function in the file
+_FUNCTION_HINTS = ('function', 'method')
+
+
+def _ignore_stream(message_type: str, content: str):
+    """Stream callback used when the caller does not want progress messages"""
+
+
+class _CodeBlockCollector:
+    """Watches streamed chunks and captures the first fenced code block as soon as it closes"""
+    
+    __slots__ = ("_chunks", "_length", "_tail", "_open", "code")
+    
+    def __init__(self):
+        self._chunks = []
+        self._length = 0
+        # Last few characters seen, so fences split across chunks are still spotted
+        self._tail = ""
+        # Offset of the first ``` seen; no block can start before it
+        self._open = -1
+        self.code = None
+    
+    def feed(self, text: str) -> bool:
+        """Add a chunk; True once the block is complete and the rest can be dropped"""
+        if self.code is None:
+            window = self._tail + text
+            window_start = self._length - len(self._tail)
+            self._chunks.append(text)
+            self._length += len(text)
+            self._tail = window[-3:]
+            if self._open < 0:
+                fence = window.find('```')
+                if fence >= 0:
+                    self._open = window_start + fence
+            # A block can only complete once a new line-leading ``` arrives, so backticks
+            # elsewhere (template literals, inline code) never trigger a rescan
+            if self._open >= 0 and '\n```' in window:
+                buffered = "".join(self._chunks)
+                self._chunks = [buffered]
+                match = _CODE_BLOCK_RE.search(buffered, self._open)
+                if match:
+                    self.code = match.group(1)
+                    self._chunks = []
+        return self.code is not None
+
+
+@dataclass(slots=True, frozen=True)
+class TargetRef:
+    """An AST element selected for modification"""
+    type: str
+    name: str
+    start_line: int
+    end_line: int
+    start_byte: Optional[int]
+    end_byte: Optional[int]
+    element: ASTNodeInfo
+    file_path: str
+
+
+def _line_offsets(text: str) -> array:
+    """Character offset at which each line of text starts"""
+    offsets = array('q', [0])
+    find = text.find
+    pos = find('\n')
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = find('\n', pos + 1)
+    return offsets
+
+
+@dataclass(slots=True)
+class _SyntaxScan:
+    """Lines, brace scan and return-line indices of a file, shared by syntax detection and fixing"""
+    lines: List[str]
+    line_starts: array
+    braces: tuple
+    return_lines: List[int]
+
 class DynamicASTModifier:
     """AST Modifier that uses dynamic JSON caching for performance"""
     
     def __init__(self):
         self.ast_processor = MultiLanguageASTProcessor()
         self.cache_manager = global_ast_cache
+        # (file_path, file_hash) -> values derived from that version's cached AST
+        self._derived_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._derived_lock = threading.Lock()  # section workers share the cache
 
-    def _detect_syntax_error_type(self, user_message: str, file_content: str) -> str:
+    def _get_syntax_scan(self, file_path: str, file_content: str) -> _SyntaxScan:
+        """Syntax scan of the content, reused while the same content is resent"""
+        # Same content hash as the AST cache, so this shares the version's derived entry
+        file_hash = _content_hasher(file_content.encode('utf-8')).hexdigest()
+        derived = self._derived(file_path, file_hash)
+        scan = derived.get("syntax_scan")
+        if scan is None:
+            scan = derived["syntax_scan"] = self._scan_syntax(file_content)
+        return scan
+
+    def _scan_syntax(self, file_content: str) -> _SyntaxScan:
+        """Split the file and scan its braces once for detection and fixing"""
+        lines = file_content.split('\n')
+        line_starts = _line_offsets(file_content)
+        
+        # Map each 'return' occurrence to its line instead of testing every line
+        return_lines = []
+        pos = file_content.find('return')
+        while pos != -1:
+            line = bisect_right(line_starts, pos) - 1
+            return_lines.append(line)
+            pos = file_content.find('return', line_starts[line + 1] if line + 1 < len(line_starts) else len(file_content))
+        
+        return _SyntaxScan(lines, line_starts, self._scan_braces(lines), return_lines)
+
+    def _detect_syntax_error_type(self, user_message: str, file_content: str,
+                                  scan: Optional[_SyntaxScan] = None) -> str:
         """Detect specific syntax error types for smarter fixing"""
         
         message_lower = user_message.lower()
         
         # Check for common syntax errors
-        if "return outside of function" in message_lower:
+        if _RETURN_OUTSIDE_FUNCTION in message_lower and 'return' in file_content:
             # Look for misplaced return statements
-            lines = file_content.split('\n')
-            for i, line in enumerate(lines):
-                if 'return' in line and not self._is_inside_function(lines, i):
+            scan = scan or self._scan_syntax(file_content)
+            for i in scan.return_lines:
+                if not self._is_inside_function(scan.lines, i, scan.braces):
                     return "misplaced_return"
         
         if "missing" in message_lower and ("brace" in message_lower or "bracket" in message_lower):
@@ -33,34 +195,67 @@ class DynamicASTModifier:
         
         return "general_syntax_error"
 
-    def _is_inside_function(self, lines: List[str], return_line_index: int) -> bool:
-        """Check if a return statement is properly inside a function"""
-        # Count braces backwards from the return statement
-        brace_count = 0
-        in_function = False
-        
-        for i in range(return_line_index, -1, -1):
-            line = lines[i].strip()
+    def _scan_braces(self, lines: List[str]) -> tuple:
+        """Single pass over lines so _is_inside_function can answer each line in O(1)
+        
+        Returns (depth, last_function, close_peak): depth[j] is the net brace count of
+        lines[:j], last_function[j] the latest arrow-function line <= j (-1 if none), and
+        close_peak[j] the highest depth[k] over closing-brace lines k < j (None if none).
+        """
+        depth = [0]
+        last_function = []
+        close_peak = []
+        running = 0
+        function_line = -1
+        peak = None
+        
+        for j, raw_line in enumerate(lines):
+            line = raw_line.strip()
+            close_peak.append(peak)
             if 'const ' in line and '= (' in line and '=>' in line:
-                in_function = True
+                function_line = j
             elif line.endswith('{'):
-                brace_count += 1
-            elif line == '}' or line.endswith('}'):
-                brace_count -= 1
-                if brace_count < 0 and in_function:
-                    return False  # We've exited the function
+                running += 1
+            elif line.endswith('}'):
+                peak = running if peak is None else max(peak, running)
+                running -= 1
+            depth.append(running)
+            last_function.append(function_line)
+        
+        return depth, last_function, close_peak
+
+    def _is_inside_function(self, lines: List[str], return_line_index: int, scan: Optional[tuple] = None) -> bool:
+        """Check if a return statement is properly inside a function"""
+        # Equivalent to counting braces backwards from the return statement: the
+        # nearest arrow function above it opens the function, and any closing brace
+        # above that which drives the backward count negative means we left it
+        depth, last_function, close_peak = scan or self._scan_braces(lines)
+        
+        function_line = last_function[return_line_index]
+        if function_line < 0:
+            return False
         
-        return in_function and brace_count >= 0
+        brace_count = depth[return_line_index + 1]
+        peak = close_peak[function_line]
+        if peak is not None and peak > brace_count:
+            return False  # We've exited the function
+        
+        return brace_count >= 0
     
-    def _fix_syntax_error_smart(self, file_content: str, error_type: str, user_message: str) -> str:
+    def _fix_syntax_error_smart(self, file_content: str, error_type: str, user_message: str,
+                                scan: Optional[_SyntaxScan] = None) -> str:
         """Smart syntax error fixing without multiple LLM calls"""
         
         if error_type == "misplaced_return":
-            lines = file_content.split('\n')
+            if 'return (' not in file_content:
+                return file_content  # Nothing the fix below could match
+            
+            scan = scan or self._scan_syntax(file_content)
+            lines = scan.lines
             
             # Find the problematic return statement
-            for i, line in enumerate(lines):
-                if 'return (' in line.strip() and not self._is_inside_function(lines, i):
+            for i in scan.return_lines:
+                if 'return (' in lines[i] and not self._is_inside_function(lines, i, scan.braces):
                     # Look backwards for the function that needs a closing brace
                     for j in range(i-1, -1, -1):
                         if ('const ' in lines[j] and '= (' in lines[j]) or 'function ' in lines[j]:
@@ -75,13 +270,13 @@ class DynamicASTModifier:
                             # If brace_count > 0, we need to add closing braces
                             if brace_count > 0:
                                 # Add the missing closing brace before the return
-                                lines.insert(i, '  };')  # Add proper indentation
-                                break
+                                line_start = scan.line_starts[i]
+                                return file_content[:line_start] + '  };\n' + file_content[line_start:]  # Add proper indentation
                             break
                     
                     break
             
-            return '\n'.join(lines)
+            return file_content
         
         return file_content  # Fallback to original if we can't fix it
     
@@ -94,18 +289,20 @@ class DynamicASTModifier:
                                            stream_callback: Callable[[str, str], None] = None) -> Dict[str, Any]:
         """Apply modifications using cached AST data"""
         
-        def stream(message_type: str, content: str):
-            if stream_callback:
-                stream_callback(message_type, content)
-            print(f"[{message_type.upper()}] {content}")
+        # The caller's callback does its own printing; without one progress is dropped
+        stream = stream_callback or _ignore_stream
         
-        error_type = self._detect_syntax_error_type(user_message, file_content)
+        # Split and scan the file once, only when the message and file can lead to a return fix
+        scan = None
+        if _RETURN_OUTSIDE_FUNCTION in user_message.lower() and 'return' in file_content:
+            scan = self._get_syntax_scan(file_path, file_content)
+        error_type = self._detect_syntax_error_type(user_message, file_content, scan)
     
         if error_type != "general_syntax_error":
             stream("smart_fix", f"Detected {error_type}, applying smart fix...")
             
             # Try smart fix first
-            fixed_content = self._fix_syntax_error_smart(file_content, error_type, user_message)
+            fixed_content = self._fix_syntax_error_smart(file_content, error_type, user_message, scan)
             
             if fixed_content != file_content:
                 return {
@@ -139,7 +336,7 @@ class DynamicASTModifier:
         stream("analysis", f"Target elements: {len(analysis['targets'])}")
         
         if analysis['targets']:
-            target_names = [t['name'] for t in analysis['targets']]
+            target_names = [t.name for t in analysis['targets']]
             stream("analysis", f"Targets found: {', '.join(target_names)}")
         
         # Apply modifications
@@ -169,45 +366,62 @@ class DynamicASTModifier:
             "is_syntax_fix": self._is_syntax_error_fix(user_message)
         }
     
-    def _extract_targets_from_cached_ast(self, file_ast: FileASTInfo, user_message: str) -> List[Dict[str, Any]]:
+    def _extract_targets_from_cached_ast(self, file_ast: FileASTInfo, user_message: str) -> List[TargetRef]:
         """Extract target elements from cached AST - DEDUPLICATED VERSION"""
     
-        targets = []
+        candidates, names = self._get_target_index(file_ast)
         message_lower = user_message.lower()
-        seen_targets = set()  # Add this to prevent duplicates
         
-        # Keywords to ignore
-        ignore_keywords = {
-            'if', 'else', 'elif', 'for', 'while', 'do', 'switch', 'case', 'break', 
-            'continue', 'return', 'try', 'catch', 'finally', 'throw', 'new', 'var', 
-            'let', 'const', 'function', 'class', 'import', 'export', 'default'
-        }
+        # Mentioning functions in general targets all of them
+        if any(hint in message_lower for hint in _FUNCTION_HINTS):
+            return list(candidates)
+        
+        # Otherwise only functions named in the message; usually none are
+        mentioned = {name for name in names if name in message_lower}
+        if not mentioned:
+            return []
+        return [target for target in candidates if target.element.name_lower in mentioned]
+    
+    def _derived(self, file_path: str, file_hash: str) -> Dict[str, Any]:
+        """Store for values derived from one version of a file (its content or cached AST)"""
+        key = (file_path, file_hash)
+        with self._derived_lock:
+            derived = self._derived_cache.get(key)
+            if derived is not None:
+                self._derived_cache.move_to_end(key)
+                return derived
+            
+            derived = self._derived_cache[key] = {}
+            while len(self._derived_cache) > DERIVED_CACHE_SIZE:
+                self._derived_cache.popitem(last=False)
+            return derived
+    
+    def _get_target_index(self, file_ast: FileASTInfo) -> tuple:
+        """Candidate function targets and their lowercased names, built once per file version"""
+        
+        derived = self._derived(file_ast.file_path, file_ast.file_hash)
+        index = derived.get("targets")
+        if index is not None:
+            return index
+        
+        candidates = []
+        seen_targets = set()  # (name, start_line) pairs, to prevent duplicates
         
-        # Check functions
         for func in file_ast.functions:
             func_name = func.name
-            target_key = f"function:{func_name}:{func.start_line}"  # Unique key
+            if not func_name or len(func_name) <= 2 or func.name_lower in _IGNORE_KEYWORDS:
+                continue
             
-            if (func_name and 
-                target_key not in seen_targets and  # Check for duplicates
-                func_name.lower() not in ignore_keywords and
-                len(func_name) > 2 and
-                (func_name.lower() in message_lower or 
-                any(keyword in message_lower for keyword in ['function', 'method']))):
-                
-                targets.append({
-                    "type": "function",
-                    "name": func_name,
-                    "start_line": func.start_line,
-                    "end_line": func.end_line,
-                    "start_byte": func.start_byte,
-                    "end_byte": func.end_byte,
-                    "element": func,
-                    "file_path": func.file_path
-                })
+            target_key = (func_name, func.start_line)
+            if target_key not in seen_targets:
+                candidates.append(TargetRef(
+                    "function", func_name, func.start_line, func.end_line,
+                    func.start_byte, func.end_byte, func, func.file_path
+                ))
                 seen_targets.add(target_key)
         
-        return targets
+        index = derived["targets"] = (tuple(candidates), frozenset(target.element.name_lower for target in candidates))
+        return index
     
     def _apply_cached_ast_modifications(self,
                                        file_content: str,
@@ -217,46 +431,59 @@ class DynamicASTModifier:
                                        stream: Callable[[str, str], None]) -> Dict[str, Any]:
         """Apply modifications using cached AST information"""
         
-        lines = file_content.split('\n')
+        line_starts = _line_offsets(file_content)
+        line_count = len(line_starts)
         changes = []
+        planned = []  # (target, start, end, original_section) per section to regenerate
+        edits = []  # (start, end, text) character ranges of the original content
         
-        # Sort targets by end line (descending) to avoid offset issues
-        targets = sorted(analysis['targets'], key=lambda x: x['end_line'], reverse=True)
+        # Sort targets by end line (descending), as the changes are reported in that order
+        targets = sorted(analysis['targets'], key=lambda x: x.end_line, reverse=True)
         
         stream("processing", f"Applying modifications to {len(targets)} elements")
         
         for i, target in enumerate(targets):
-            element_name = target['name']
-            element_type = target['type']
-            start_line = target['start_line'] - 1  # Convert to 0-based
-            end_line = target['end_line'] - 1
+            element_name = target.name
+            element_type = target.type
+            start_line = target.start_line - 1  # Convert to 0-based
+            end_line = min(target.end_line - 1, line_count - 1)  # Clamp to the file length
             
             stream("modifying", f"Modifying {element_type} '{element_name}' at lines {start_line+1}-{end_line+1} ({i+1}/{len(targets)})")
             
-            # Extract original section
-            if end_line < len(lines):
-                original_section = '\n'.join(lines[start_line:end_line + 1])
-            else:
-                # Handle edge case where end_line exceeds file length
-                original_section = '\n'.join(lines[start_line:])
-                end_line = len(lines) - 1
+            start = line_starts[start_line] if start_line < line_count else len(file_content)
+            end = line_starts[end_line + 1] - 1 if end_line + 1 < line_count else len(file_content)
+            if any(start < planned_end and planned_start < end for _, planned_start, planned_end, _ in planned):
+                # Nested or overlapping element is rewritten along with its parent
+                stream("unchanged", f"Skipping {element_type} '{element_name}', it overlaps another modification")
+                continue
             
-            # Generate modified section
-            modified_section = self._generate_section_modification_with_context(
-                original_section, target, user_message, file_ast, stream
-            )
+            # Extract original section
+            planned.append((target, start, end, file_content[start:end]))
+        
+        # Generate modified sections (independent LLM calls, run concurrently)
+        modified_sections = self._generate_sections(planned, user_message, file_ast, stream)
+        
+        for (target, start, end, original_section), modified_section in zip(planned, modified_sections):
+            element_name = target.name
+            element_type = target.type
             
             if modified_section and modified_section.strip() != original_section.strip():
-                # Apply modification
-                modified_lines = modified_section.split('\n')
-                lines[start_line:end_line + 1] = modified_lines
+                edits.append((start, end, modified_section))
                 
-                changes.append(f"Modified {element_type} '{element_name}' at line {start_line + 1}")
+                changes.append(f"Modified {element_type} '{element_name}' at line {target.start_line}")
                 stream("success", f"Successfully modified {element_type} '{element_name}'")
             else:
                 stream("unchanged", f"No changes needed for {element_type} '{element_name}'")
         
-        modified_content = '\n'.join(lines)
+        # Splice every edit in one pass over the original content
+        parts = []
+        pos = 0
+        for start, end, text in sorted(edits):
+            parts.append(file_content[pos:start])
+            parts.append(text)
+            pos = end
+        parts.append(file_content[pos:])
+        modified_content = "".join(parts)
         
         return {
             "success": True,
@@ -268,20 +495,60 @@ class DynamicASTModifier:
             "parser_used": f"cached_ast_{file_ast.parser_type}"
         }
     
+    def _generate_sections(self,
+                           planned: List[tuple],
+                           user_message: str,
+                           file_ast: FileASTInfo,
+                           stream: Callable[[str, str], None]) -> List[str]:
+        """Generate every planned section, on worker threads when there are several"""
+        
+        if len(planned) <= 1:
+            return [
+                self._generate_section_modification_with_context(section, target, user_message, file_ast, stream)
+                for target, _, _, section in planned
+            ]
+        
+        # Workers queue their progress; it is relayed to stream from this thread only
+        progress = queue.Queue()
+        
+        def relay(message_type: str, content: str):
+            progress.put((message_type, content))
+        
+        def drain():
+            while True:
+                try:
+                    stream(*progress.get_nowait())
+                except queue.Empty:
+                    return
+        
+        with ThreadPoolExecutor(max_workers=min(len(planned), MAX_SECTION_WORKERS)) as executor:
+            futures = [
+                executor.submit(self._generate_section_modification_with_context,
+                                section, target, user_message, file_ast, relay)
+                for target, _, _, section in planned
+            ]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.1)
+                drain()
+        
+        drain()
+        return [future.result() for future in futures]
+    
     def _generate_section_modification_with_context(self,
                                                    original_section: str,
-                                                   target: Dict[str, Any],
+                                                   target: TargetRef,
                                                    user_message: str,
                                                    file_ast: FileASTInfo,
                                                    stream: Callable[[str, str], None]) -> str:
         """Generate modified section with full AST context"""
 
-        element = target['element']
+        element = target.element
 
         # Build context from AST
         context_info = self._build_modification_context(element, file_ast)
 
-        system_prompt = f"""You are modifying a specific {target['type']} in {file_ast.language} code with STRICT USER INSTRUCTION ENFORCEMENT.
+        system_prompt = f"""You are modifying a specific {target.type} in {file_ast.language} code with STRICT USER INSTRUCTION ENFORCEMENT.
 
 ORIGINAL TECHNOLOGY STACK ENFORCEMENT:
 - Language: {file_ast.language}
@@ -293,13 +560,13 @@ AST CONTEXT:
 {context_info}
 
 MODIFICATION RULES:
-1. Return ONLY the modified {target['type']} code
+1. Return ONLY the modified {target.type} code
 2. Maintain the same indentation level as the original
 3. Keep the same technology stack and import patterns
 4. Only modify what's necessary based on the user request
 5. Preserve the original code structure and style
 
-Original {target['type']} ({file_ast.language}):
+Original {target.type} ({file_ast.language}):
 ```{file_ast.language}
 {original_section}
 ```
@@ -309,22 +576,24 @@ User request: {user_message}
 ENFORCE: Use the same technologies as the original code. Do not change the tech stack."""
 
         try:
-            stream("llm_call", f"Generating modification for {target['name']} with AST context")
+            stream("llm_call", f"Generating modification for {target.name} with AST context")
 
+            code_block = _CodeBlockCollector()
             response_content, _, _ = stream_llm(
                 system=system_prompt + get_prompt_suffix(),
                 messages=[{
                     "role": "user",
-                    "content": f"Modify the {target['type']} '{target['name']}' according to this request: {user_message}"
+                    "content": f"Modify the {target.type} '{target.name}' according to this request: {user_message}"
                 }],
                 max_tokens=4000,
                 temperature=0.1,
+                stop_when=code_block.feed,  # Prose after the code block is not needed
             )
 
             stream("llm_complete", "Section modification complete")
 
             # Extract code from response
-            modified_code = self._extract_code_from_response(response_content)
+            modified_code = self._code_from_stream(code_block, response_content)
             return modified_code or original_section
 
         except Exception as e:
@@ -334,6 +603,16 @@ ENFORCE: Use the same technologies as the original code. Do not change the tech
     def _build_modification_context(self, element: ASTNodeInfo, file_ast: FileASTInfo) -> str:
         """Build context information from AST for better modifications"""
         
+        contexts = self._derived(file_ast.file_path, file_ast.file_hash).setdefault("element_contexts", {})
+        key = (element.type, element.name, element.start_line)
+        context = contexts.get(key)
+        if context is None:
+            context = contexts[key] = self._format_modification_context(element, file_ast)
+        return context
+    
+    def _format_modification_context(self, element: ASTNodeInfo, file_ast: FileASTInfo) -> str:
+        """Format the element and file context for a section modification prompt"""
+        
         context_parts = []
         
         # Element-specific context
@@ -397,6 +676,7 @@ MODIFICATION APPROACH:
 Return the complete modified file content while maintaining the original technology choices."""
 
         try:
+            code_block = _CodeBlockCollector()
             response_content, _, _ = stream_llm(
                 system=system_prompt + get_prompt_suffix(),
                 messages=[{
@@ -405,11 +685,12 @@ Return the complete modified file content while maintaining the original technol
                 }],
                 max_tokens=8000,
                 temperature=0.1,
+                stop_when=code_block.feed,
             )
 
             stream("llm_complete", "General modification complete")
 
-            modified_content = self._extract_code_from_response(response_content) or file_content
+            modified_content = self._code_from_stream(code_block, response_content) or file_content
             
             return {
                 "success": True,
@@ -432,45 +713,53 @@ Return the complete modified file content while maintaining the original technol
     
     def _build_file_ast_context(self, file_ast: FileASTInfo) -> str:
         """Build comprehensive AST context for a file"""
-        
-        context_parts = []
+        derived = self._derived(file_ast.file_path, file_ast.file_hash)
+        context = derived.get("file_context")
+        if context is None:
+            context = derived["file_context"] = "\n".join(self._iter_file_ast_context(file_ast))
+        return context
+    
+    def _iter_file_ast_context(self, file_ast: FileASTInfo):
+        """Yield the lines of the file AST context, capped to the prompt budget"""
         
         # File overview
-        context_parts.append(f"File: {file_ast.file_path}")
-        context_parts.append(f"Language: {file_ast.language}")
-        context_parts.append(f"Total lines: {file_ast.total_lines}")
-        context_parts.append(f"Complexity score: {file_ast.complexity_score}")
-        context_parts.append(f"Has syntax errors: {file_ast.has_syntax_errors}")
+        yield f"File: {file_ast.file_path}"
+        yield f"Language: {file_ast.language}"
+        yield f"Total lines: {file_ast.total_lines}"
+        yield f"Complexity score: {file_ast.complexity_score}"
+        yield f"Has syntax errors: {file_ast.has_syntax_errors}"
         
         # Functions
         if file_ast.functions:
-            context_parts.append(f"\nFunctions ({len(file_ast.functions)}):")
-            for func in file_ast.functions:
+            yield f"\nFunctions ({len(file_ast.functions)}):"
+            for func in file_ast.functions[:MAX_CONTEXT_FUNCTIONS]:
                 func_info = f"  - {func.name}()"
                 if func.parameters:
                     func_info += f" [params: {', '.join(func.parameters)}]"
                 if func.is_async:
                     func_info += " [async]"
-                context_parts.append(func_info)
+                yield func_info
+            if len(file_ast.functions) > MAX_CONTEXT_FUNCTIONS:
+                yield f"  ... ({len(file_ast.functions) - MAX_CONTEXT_FUNCTIONS} more)"
         
         # Classes
         if file_ast.classes:
-            context_parts.append(f"\nClasses ({len(file_ast.classes)}):")
-            for cls in file_ast.classes:
+            yield f"\nClasses ({len(file_ast.classes)}):"
+            for cls in file_ast.classes[:MAX_CONTEXT_CLASSES]:
                 cls_info = f"  - {cls.name}"
                 if cls.inheritance:
                     cls_info += f" extends {', '.join(cls.inheritance)}"
                 if cls.methods:
                     cls_info += f" [methods: {', '.join(cls.methods)}]"
-                context_parts.append(cls_info)
+                yield cls_info
+            if len(file_ast.classes) > MAX_CONTEXT_CLASSES:
+                yield f"  ... ({len(file_ast.classes) - MAX_CONTEXT_CLASSES} more)"
         
         # Imports
         if file_ast.imports:
-            context_parts.append(f"\nImports ({len(file_ast.imports)}):")
+            yield f"\nImports ({len(file_ast.imports)}):"
             for imp in file_ast.imports[:10]:  # First 10 imports
-                context_parts.append(f"  - {imp.name}")
-        
-        return "\n".join(context_parts)
+                yield f"  - {imp.name}"
     
     def get_project_ast_summary(self, project_id: str, project_name: str) -> Dict[str, Any]:
         """Get AST summary for a project"""
@@ -487,59 +776,63 @@ Return the complete modified file content while maintaining the original technol
         project_cache = self.cache_manager.get_project_cache(project_id, project_name)
         
         # Remove from cache
-        if file_path in project_cache._memory_cache:
-            del project_cache._memory_cache[file_path]
-        if file_path in project_cache._index_cache:
-            del project_cache._index_cache[file_path]
+        project_cache.invalidate_file(file_path)
         
         # Re-parse and cache
         project_cache.get_or_parse_ast(file_path, file_content, self.ast_processor)
     
+    def refresh_project_ast(self, project_id: str, project_name: str, files: Dict[str, str]):
+        """Force refresh AST cache for many files, parsing them in parallel"""
+        project_cache = self.cache_manager.get_project_cache(project_id, project_name)
+        
+        for file_path in files:
+            project_cache.invalidate_file(file_path)
+        project_cache.bulk_parse_and_cache(files, self.ast_processor)
+    
     def clear_project_cache(self, project_id: str):
         """Clear AST cache for a project"""
         self.cache_manager.clear_project_cache(project_id)
     
     # Helper methods
-    def _detect_modification_type(self, message: str) -> str:
-        """Detect modification type from user message"""
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _detect_modification_type(message: str) -> str:
+        """Detect modification type from user message (memoized per message)"""
         message_lower = message.lower()
         
-        if any(word in message_lower for word in ["add", "create", "new", "implement"]):
-            return "add"
-        elif any(word in message_lower for word in ["fix", "bug", "error", "correct", "syntax"]):
-            return "fix"
-        elif any(word in message_lower for word in ["update", "modify", "change", "improve"]):
-            return "update"
-        elif any(word in message_lower for word in ["remove", "delete", "drop"]):
-            return "remove"
-        elif any(word in message_lower for word in ["refactor", "restructure", "optimize"]):
-            return "refactor"
-        else:
-            return "general"
+        best = None
+        for match in _MODIFICATION_TYPE_RE.finditer(message_lower):
+            mod_type = match.lastgroup
+            if mod_type == "add":
+                return mod_type  # Highest priority, nothing can beat it
+            if best is None or _MODIFICATION_PRIORITY[mod_type] < _MODIFICATION_PRIORITY[best]:
+                best = mod_type
+        return best or "general"
     
-    def _is_syntax_error_fix(self, user_message: str) -> bool:
-        """Check if this is a syntax error fix"""
-        syntax_keywords = [
-            'syntax error', 'unexpected identifier', 'parse error', 
-            'syntax', 'identifier', 'template literal', 'quote', 'bracket'
-        ]
-        message_lower = user_message.lower()
-        return any(keyword in message_lower for keyword in syntax_keywords)
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _is_syntax_error_fix(user_message: str) -> bool:
+        """Check if this is a syntax error fix (memoized per message)"""
+        return _SYNTAX_FIX_RE.search(user_message.lower()) is not None
+    
+    def _code_from_stream(self, code_block: _CodeBlockCollector, response: str) -> Optional[str]:
+        """Code captured while streaming, else extracted from the full response"""
+        if code_block.code is not None:
+            return code_block.code
+        return self._extract_code_from_response(response)
     
     def _extract_code_from_response(self, response: str) -> Optional[str]:
         """Extract code from LLM response"""
-        import re
-        
-        # Look for code blocks
-        code_block_match = re.search(r'```(?:\w+)?\s*\n(.*?)\n```', response, re.DOTALL)
-        if code_block_match:
-            return code_block_match.group(1)
+        # Look for code blocks (the substring test is far cheaper than a failed regex scan)
+        if '```' in response:
+            code_block_match = _CODE_BLOCK_RE.search(response)
+            if code_block_match:
+                return code_block_match.group(1)
         
         # If no code block, check if entire response looks like code
-        lines = response.strip().split('\n')
-        if len(lines) > 1:
-            code_indicators = ['def ', 'function ', 'class ', '{', '}', 'import ', 'from ']
-            if any(indicator in response for indicator in code_indicators):
-                return response.strip()
+        stripped = response.strip()
+        if '\n' in stripped:
+            if any(indicator in response for indicator in _CODE_INDICATORS):
+                return stripped
         
         return None
\ No newline at end of file
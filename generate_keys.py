@@ -6,9 +6,11 @@ into the keys/ folder so that server.py can start with HTTPS enabled.
 
 Usage:
     python generate_keys.py
+    python generate_keys.py --force                  # regenerate even if still valid
+    GENSTACK_KEY_SIZE=2048 python generate_keys.py   # RSA key instead
 
 Output:
-    keys/privkey.pem   — RSA 4096-bit private key
+    keys/privkey.pem   — ECDSA P-256 private key (RSA when GENSTACK_KEY_SIZE is set)
     keys/fullchain.pem — Self-signed X.509 certificate
 
 NOTE: Self-signed certificates are for LOCAL DEVELOPMENT ONLY.
@@ -19,19 +21,26 @@ NOTE: Self-signed certificates are for LOCAL DEVELOPMENT ONLY.
 import os
 import datetime
 import ipaddress
+import multiprocessing
+import queue
+import sys
 
 from cryptography import x509
 from cryptography.x509.oid import NameOID
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
 from cryptography.hazmat.backends import default_backend
 
 # ── Configuration ────────────────────────────────────────────────────────────
 KEYS_DIR       = "keys"
 KEY_FILE       = os.path.join(KEYS_DIR, "privkey.pem")
 CERT_FILE      = os.path.join(KEYS_DIR, "fullchain.pem")
-KEY_SIZE       = 4096          # RSA key size in bits
+KEY_CURVE      = ec.SECP256R1  # NIST P-256, ~RSA-3072 strength; keygen is near-instant
+# Optional RSA key size in bits for clients that need RSA; 4096 takes minutes to generate
+KEY_SIZE       = int(os.environ["GENSTACK_KEY_SIZE"]) if os.environ.get("GENSTACK_KEY_SIZE") else None
+RSA_RACERS     = min(2, os.cpu_count() or 1)  # independent RSA keygens raced; first one wins
 CERT_VALID_DAYS = 825          # ~2 years (browser limit for self-signed)
+CERT_REUSE_DAYS = 30           # keep an existing cert that is valid at least this long
 
 # Certificate subject fields (safe defaults for local dev)
 COUNTRY        = "US"
@@ -48,6 +57,10 @@ def print_banner():
     print("  GenStack — SSL Key Generator")
     print("=" * 60)
     print()
+    if KEY_SIZE is None:
+        print("  Key type: ECDSA P-256 (set GENSTACK_KEY_SIZE=2048 for RSA,")
+        print("            or GENSTACK_KEY_SIZE=4096 for the old RSA-4096 keys)")
+        print()
 
 
 def ensure_keys_dir():
@@ -59,19 +72,66 @@ def ensure_keys_dir():
 
 
 def generate_private_key():
-    print(f"[+] Generating RSA {KEY_SIZE}-bit private key...")
+    # getrandom() blocks until the kernel pool is seeded; on a freshly booted VM any
+    # wait happens here, once, rather than inside OpenSSL's key generation
+    os.urandom(32)
+
+    if KEY_SIZE:
+        print(f"[+] Generating RSA {KEY_SIZE}-bit private key...")
+        if RSA_RACERS > 1:
+            return race_rsa_keygen(KEY_SIZE, RSA_RACERS)
+        return rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=KEY_SIZE,
+            backend=default_backend()
+        )
+
+    print(f"[+] Generating ECDSA {KEY_CURVE.name} private key...")
+    key = ec.generate_private_key(KEY_CURVE(), default_backend())
+    return key
+
+
+def _rsa_keygen_worker(key_size, results):
     key = rsa.generate_private_key(
         public_exponent=65537,
-        key_size=KEY_SIZE,
+        key_size=key_size,
         backend=default_backend()
     )
-    return key
+    results.put(key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ))
+
+
+def race_rsa_keygen(key_size, racers):
+    # Prime search time varies widely with RNG luck, so run independent searches
+    # in parallel, keep whichever finishes first and kill the rest
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_rsa_keygen_worker, args=(key_size, results), daemon=True)
+        for _ in range(racers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while True:
+            try:
+                key_pem = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers) and results.empty():
+                    raise RuntimeError("RSA key generation failed in every worker process")
+    finally:
+        for worker in workers:
+            worker.terminate()
+    return serialization.load_pem_private_key(key_pem, password=None, backend=default_backend())
 
 
 def save_private_key(key):
     key_pem = key.private_bytes(
         encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        format=serialization.PrivateFormat.PKCS8,
         encryption_algorithm=serialization.NoEncryption()
     )
     with open(KEY_FILE, "wb") as f:
@@ -132,6 +192,46 @@ def save_certificate(cert):
     print(f"[+] Certificate saved:  {CERT_FILE}")
 
 
+def is_requested_key_type(public_key):
+    """True when the key is the type and size this run would generate."""
+    if KEY_SIZE:
+        return isinstance(public_key, rsa.RSAPublicKey) and public_key.key_size == KEY_SIZE
+    return isinstance(public_key, ec.EllipticCurvePublicKey) and public_key.curve.name == KEY_CURVE.name
+
+
+def load_reusable_certificate():
+    """Return the existing certificate if it matches its key and the requested key type
+    and is not near expiry."""
+    if not (os.path.exists(KEY_FILE) and os.path.exists(CERT_FILE)):
+        return None
+    try:
+        with open(CERT_FILE, "rb") as f:
+            cert = x509.load_pem_x509_certificate(f.read(), default_backend())
+        with open(KEY_FILE, "rb") as f:
+            key = serialization.load_pem_private_key(f.read(), password=None, backend=default_backend())
+    except (ValueError, TypeError):
+        return None  # Unreadable or encrypted files; regenerate
+
+    # A mismatched pair would only fail later, at TLS startup
+    cert_public_key = cert.public_key()
+    if not is_requested_key_type(cert_public_key):
+        return None
+    try:
+        if cert_public_key.public_numbers() != key.public_key().public_numbers():
+            return None
+    except AttributeError:
+        return None
+
+    if hasattr(cert, "not_valid_after_utc"):
+        not_after = cert.not_valid_after_utc
+    else:
+        not_after = cert.not_valid_after.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if not_after > now + datetime.timedelta(days=CERT_REUSE_DAYS):
+        return cert
+    return None
+
+
 def check_existing_files():
     existing = []
     if os.path.exists(KEY_FILE):
@@ -151,6 +251,14 @@ def check_existing_files():
     return True
 
 
+def describe_key(public_key):
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return f"RSA {public_key.key_size}-bit"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return f"ECDSA {public_key.curve.name}"
+    return type(public_key).__name__
+
+
 def print_summary(cert):
     not_before = cert.not_valid_before_utc if hasattr(cert, "not_valid_before_utc") else cert.not_valid_before
     not_after  = cert.not_valid_after_utc  if hasattr(cert, "not_valid_after_utc")  else cert.not_valid_after
@@ -164,7 +272,7 @@ def print_summary(cert):
     print(f"  Certificate : {CERT_FILE}")
     print(f"  Valid from  : {not_before.strftime('%Y-%m-%d')}")
     print(f"  Valid until : {not_after.strftime('%Y-%m-%d')}")
-    print(f"  Key size    : RSA {KEY_SIZE}-bit")
+    print(f"  Key type    : {describe_key(cert.public_key())}")
     print(f"  Common name : {COMMON_NAME}")
     print()
     print("  Next step — start the server:")
@@ -188,6 +296,15 @@ def print_summary(cert):
 def main():
     print_banner()
 
+    # Fast path: keep a certificate that is still comfortably valid
+    if "--force" not in sys.argv[1:]:
+        existing = load_reusable_certificate()
+        if existing is not None:
+            print(f"[+] Existing certificate is valid for more than {CERT_REUSE_DAYS} days; keeping it.")
+            print("    Run with --force to generate new keys.")
+            print_summary(existing)
+            return
+
     # Check if overwrite is needed
     if not check_existing_files():
         return
@@ -1,8 +1,12 @@
 from flask import Flask, render_template, redirect, url_for, flash, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.schema import CreateIndex
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import functools
 import os
 
 """
@@ -29,9 +33,25 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-for-testing')
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///babysitter.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# PBKDF2-SHA256 with an explicit work factor, so older werkzeug releases don't fall back
+# to their lower default; check_password_hash reads the count back from each stored hash
+PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+# Bump when models or indexes change so startup re-runs create_all and the index backfill
+SCHEMA_VERSION = 1
+
 # Initialize database
 db = SQLAlchemy(app)
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL so readers don't block the writer, and fsync at checkpoints rather than every commit."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
+
 # Initialize login manager
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -44,7 +64,7 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    user_type = db.Column(db.String(10), nullable=False)  # 'parent' or 'sitter'
+    user_type = db.Column(db.String(10), nullable=False, index=True)  # 'parent' or 'sitter'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -72,6 +92,12 @@ class Booking(db.Model):
     end_time = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected, completed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Dashboards filter by one side of the booking and sort by start time
+    __table_args__ = (
+        db.Index('ix_booking_parent_start', 'parent_id', 'start_time'),
+        db.Index('ix_booking_sitter_start', 'sitter_id', 'start_time'),
+    )
 
 class Review(db.Model):
     """Reviews left by parents for sitters after completed bookings."""
@@ -84,11 +110,25 @@ class Review(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     booking = db.relationship('Booking')
+    
+    # Rating stats group by the reviewed sitter; covering rating avoids table lookups
+    __table_args__ = (
+        db.Index('ix_review_reviewed_rating', 'reviewed_id', 'rating'),
+    )
+
+# Bumped whenever a sitter signs up or edits their profile; the cached sitter list is keyed on it.
+# The counter is per process, which matches the single-process app.run() deployment below.
+_sitter_generation = [0]
+
+@functools.lru_cache(maxsize=1)
+def _load_sitters(generation):
+    """All sitters with their profiles loaded, so the detached copies render without the session."""
+    return User.query.filter_by(user_type='sitter').options(joinedload(User.sitter_profile)).all()
 
 @login_manager.user_loader
 def load_user(user_id):
     """Load a user from the database for Flask-Login."""
-    return User.query.get(int(user_id))
+    return db.session.get(User, int(user_id))
 
 # Routes
 @app.route('/')
@@ -114,7 +154,7 @@ def register():
         # Create new user
         new_user = User(
             email=email,
-            password=generate_password_hash(password, method='pbkdf2:sha256'),
+            password=generate_password_hash(password, method=PASSWORD_HASH_METHOD),
             name=name,
             user_type=user_type
         )
@@ -127,6 +167,8 @@ def register():
             db.session.add(sitter_profile)
             
         db.session.commit()
+        if user_type == 'sitter':
+            _sitter_generation[0] += 1
         
         flash('Registration successful! Please login.')
         return redirect(url_for('login'))
@@ -169,13 +211,23 @@ def parent_dashboard():
     if current_user.user_type != 'parent':
         return redirect(url_for('index'))
     
-    # Get all sitters
-    sitters = User.query.filter_by(user_type='sitter').all()
+    # Get all sitters, reusing the list until a sitter signs up or edits their profile
+    sitters = _load_sitters(_sitter_generation[0])
+    
+    # Review count and average rating for every sitter in one grouped query
+    rating_stats = {
+        sitter_id: (count, round(average, 1))
+        for sitter_id, count, average in db.session.query(
+            Review.reviewed_id, db.func.count(Review.id), db.func.avg(Review.rating)
+        ).group_by(Review.reviewed_id)
+    }
     
     # Get parent's bookings
-    bookings = Booking.query.filter_by(parent_id=current_user.id).order_by(Booking.start_time.desc()).all()
+    bookings = (Booking.query.filter_by(parent_id=current_user.id)
+                .options(joinedload(Booking.sitter))
+                .order_by(Booking.start_time.desc()).all())
     
-    return render_template('parent_dashboard.html', sitters=sitters, bookings=bookings)
+    return render_template('parent_dashboard.html', sitters=sitters, bookings=bookings, rating_stats=rating_stats)
 
 @app.route('/sitter/dashboard')
 @login_required
@@ -188,7 +240,9 @@ def sitter_dashboard():
     profile = current_user.sitter_profile
     
     # Get sitter's bookings
-    bookings = Booking.query.filter_by(sitter_id=current_user.id).order_by(Booking.start_time.desc()).all()
+    bookings = (Booking.query.filter_by(sitter_id=current_user.id)
+                .options(joinedload(Booking.parent))
+                .order_by(Booking.start_time.desc()).all())
     
     return render_template('sitter_dashboard.html', profile=profile, bookings=bookings)
 
@@ -208,6 +262,7 @@ def sitter_profile():
         profile.availability = request.form.get('availability')
         
         db.session.commit()
+        _sitter_generation[0] += 1
         flash('Profile updated successfully!')
         return redirect(url_for('sitter_dashboard'))
     
@@ -217,8 +272,12 @@ def sitter_profile():
 @login_required
 def view_sitter(sitter_id):
     """View a sitter's profile and reviews."""
-    sitter = User.query.filter_by(id=sitter_id, user_type='sitter').first_or_404()
-    reviews = Review.query.filter_by(reviewed_id=sitter_id).all()
+    sitter = (User.query.filter_by(id=sitter_id, user_type='sitter')
+              .options(joinedload(User.sitter_profile),
+                       selectinload(User.reviews_received).joinedload(Review.reviewer))
+              .first_or_404())
+    # Same rows the template reads through sitter.reviews_received, reviewers included
+    reviews = sitter.reviews_received
     
     return render_template('view_sitter.html', sitter=sitter, reviews=reviews)
 
@@ -232,8 +291,8 @@ def book_sitter(sitter_id):
     sitter = User.query.filter_by(id=sitter_id, user_type='sitter').first_or_404()
     
     if request.method == 'POST':
-        start_time = datetime.strptime(request.form.get('start_time'), '%Y-%m-%dT%H:%M')
-        end_time = datetime.strptime(request.form.get('end_time'), '%Y-%m-%dT%H:%M')
+        start_time = datetime.fromisoformat(request.form.get('start_time'))
+        end_time = datetime.fromisoformat(request.form.get('end_time'))
         
         booking = Booking(
             parent_id=current_user.id,
@@ -302,7 +361,19 @@ def review_booking(booking_id):
 
 # Create database tables
 with app.app_context():
-    db.create_all()
+    # db.engine needs an app context; register before the first connection is opened
+    event.listen(db.engine, 'connect', set_sqlite_pragmas)
+    # Marker next to the database file records that this schema version is already in place
+    db_path = db.engine.url.database
+    schema_mark = f'{db_path}.schema_v{SCHEMA_VERSION}'
+    if not (os.path.exists(db_path) and os.path.exists(schema_mark)):
+        db.create_all()
+        # create_all skips tables that already exist, so add newer indexes to older databases too
+        with db.engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+        open(schema_mark, 'w').close()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
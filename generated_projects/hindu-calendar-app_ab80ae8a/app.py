@@ -1,40 +1,30 @@
 from flask import Flask, render_template, jsonify
-import datetime
+import calendar
+import functools
 import pytz
 
 app = Flask(__name__)
 
-# Rahu and Yamakandam timings calculation
-def get_rahu_yamakandam(date):
-    # Day of week (0 is Monday, 6 is Sunday)
-    day_of_week = date.weekday()
-    
-    # Rahu Kalam timings based on day of week (traditional calculation)
-    rahu_timings = {
-        0: ("7:30 AM", "9:00 AM"),  # Monday
-        1: ("3:00 PM", "4:30 PM"),  # Tuesday
-        2: ("12:00 PM", "1:30 PM"), # Wednesday
-        3: ("1:30 PM", "3:00 PM"),  # Thursday
-        4: ("10:30 AM", "12:00 PM"), # Friday
-        5: ("9:00 AM", "10:30 AM"), # Saturday
-        6: ("4:30 PM", "6:00 PM")   # Sunday
-    }
-    
-    # Yamakandam timings based on day of week (traditional calculation)
-    yamakandam_timings = {
-        0: ("10:30 AM", "12:00 PM"), # Monday
-        1: ("9:00 AM", "10:30 AM"),  # Tuesday
-        2: ("7:30 AM", "9:00 AM"),   # Wednesday
-        3: ("6:00 AM", "7:30 AM"),   # Thursday
-        4: ("3:00 PM", "4:30 PM"),   # Friday
-        5: ("1:30 PM", "3:00 PM"),   # Saturday
-        6: ("12:00 PM", "1:30 PM")   # Sunday
-    }
-    
-    return {
-        "rahu": rahu_timings[day_of_week],
-        "yamakandam": yamakandam_timings[day_of_week]
-    }
+# Rahu Kalam and Yamakandam timings indexed by day of week (0 is Monday, 6 is Sunday)
+RAHU_TIMINGS = (
+    ("7:30 AM", "9:00 AM"),    # Monday
+    ("3:00 PM", "4:30 PM"),    # Tuesday
+    ("12:00 PM", "1:30 PM"),   # Wednesday
+    ("1:30 PM", "3:00 PM"),    # Thursday
+    ("10:30 AM", "12:00 PM"),  # Friday
+    ("9:00 AM", "10:30 AM"),   # Saturday
+    ("4:30 PM", "6:00 PM"),    # Sunday
+)
+
+YAMAKANDAM_TIMINGS = (
+    ("10:30 AM", "12:00 PM"),  # Monday
+    ("9:00 AM", "10:30 AM"),   # Tuesday
+    ("7:30 AM", "9:00 AM"),    # Wednesday
+    ("6:00 AM", "7:30 AM"),    # Thursday
+    ("3:00 PM", "4:30 PM"),    # Friday
+    ("1:30 PM", "3:00 PM"),    # Saturday
+    ("12:00 PM", "1:30 PM"),   # Sunday
+)
 
 @app.route('/')
 def index():
@@ -42,31 +32,27 @@ def index():
 
 @app.route('/api/calendar/<int:year>/<int:month>')
 def get_calendar(year, month):
-    # Get the first day of the month
-    first_day = datetime.datetime(year, month, 1)
+    # Same range datetime.date accepts, checked before anything is cached
+    if not 1 <= year <= 9999 or not 1 <= month <= 12:
+        return jsonify({"error": "Invalid year or month"}), 400
     
-    # Get the number of days in the month
-    if month == 12:
-        last_day = datetime.datetime(year + 1, 1, 1) - datetime.timedelta(days=1)
-    else:
-        last_day = datetime.datetime(year, month + 1, 1) - datetime.timedelta(days=1)
-    
-    num_days = last_day.day
-    
-    # Get the day of the week for the first day (0 is Monday, 6 is Sunday)
-    first_day_of_week = first_day.weekday()
+    # The month's data never changes, so serialize it once and reuse the bytes
+    return app.response_class(_calendar_json(year, month), mimetype='application/json')
+
+@functools.lru_cache(maxsize=256)
+def _calendar_json(year, month):
+    # Day of the week for the first day (0 is Monday, 6 is Sunday) and the number of days
+    first_day_of_week, num_days = calendar.monthrange(year, month)
     
-    # Create calendar data
+    # Create calendar data; the weekday advances by one per day, so no per-day date objects
     calendar_data = []
     
     for day in range(1, num_days + 1):
-        current_date = datetime.datetime(year, month, day)
-        timings = get_rahu_yamakandam(current_date)
-        
+        day_of_week = (first_day_of_week + day - 1) % 7
         calendar_data.append({
             "day": day,
-            "rahu": timings["rahu"],
-            "yamakandam": timings["yamakandam"]
+            "rahu": RAHU_TIMINGS[day_of_week],
+            "yamakandam": YAMAKANDAM_TIMINGS[day_of_week]
         })
     
     return jsonify({
@@ -74,7 +60,7 @@ def get_calendar(year, month):
         "month": month,
         "first_day_of_week": first_day_of_week,
         "days": calendar_data
-    })
+    }).get_data()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8001, debug=True)
\ No newline at end of file
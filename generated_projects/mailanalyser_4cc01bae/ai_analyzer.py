@@ -1,4 +1,7 @@
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 import openai
 from dotenv import load_dotenv
 
@@ -8,6 +11,9 @@ load_dotenv()
 # Set OpenAI API key
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
+# Analyses kept in memory, keyed by a hash of the analysis type and email text
+ANALYSIS_CACHE_SIZE = 512
+
 class AIAnalyzer:
     def __init__(self):
         self.analysis_prompts = {
@@ -19,6 +25,8 @@ class AIAnalyzer:
             'priority': "On a scale of 1-5 (5 being highest), what priority should be assigned to this email? Explain your reasoning.",
             'comprehensive': "Provide a comprehensive analysis of this email including: summary, sentiment, action items, key points, category, and priority level."
         }
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def analyze_email(self, email_content, analysis_type='summary'):
         """Analyze an email using AI"""
@@ -31,6 +39,14 @@ class AIAnalyzer:
         email_text += f"Date: {email_content.get('date', 'Unknown')}\n\n"
         email_text += email_content.get('body', '')
         
+        # Re-analysing the same email the same way returns the earlier answer
+        cache_key = hashlib.blake2b(f"{analysis_type}|{email_text}".encode(), digest_size=16).digest()
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return dict(cached)
+        
         # Get the appropriate analysis prompt
         prompt = self.analysis_prompts.get(analysis_type, self.analysis_prompts['summary'])
         
@@ -49,9 +65,14 @@ class AIAnalyzer:
             # Extract and return the analysis result
             analysis_result = response.choices[0].message.content.strip()
             
-            return {
+            result = {
                 'analysis_type': analysis_type,
                 'result': analysis_result
             }
+            with self._cache_lock:
+                self._cache[cache_key] = result
+                if len(self._cache) > ANALYSIS_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            return dict(result)
         except Exception as e:
             raise Exception(f"Error analyzing email: {str(e)}")
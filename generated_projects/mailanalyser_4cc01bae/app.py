@@ -1,5 +1,9 @@
 import os
 import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
 from flask_wtf import CSRFProtect
 from dotenv import load_dotenv
@@ -18,6 +22,29 @@ csrf = CSRFProtect(app)
 email_service = EmailService()
 ai_analyzer = AIAnalyzer()
 
+# OpenAI calls take seconds; run them off the request thread and let the client poll
+ANALYSIS_WORKERS = 16
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+MAX_ANALYSIS_JOBS = 256
+ANALYSIS_JOB_TTL_SECONDS = 600
+analysis_jobs = {}  # job_id -> (session account token, Future, created_at)
+analysis_jobs_lock = threading.Lock()
+
+def _prune_analysis_jobs(now):
+    """Drop expired jobs and the oldest ones over the cap; caller holds the lock."""
+    for job_id, (_, future, created_at) in list(analysis_jobs.items()):
+        if now - created_at > ANALYSIS_JOB_TTL_SECONDS:
+            future.cancel()
+            del analysis_jobs[job_id]
+    while len(analysis_jobs) >= MAX_ANALYSIS_JOBS:
+        oldest_id = next(iter(analysis_jobs))
+        analysis_jobs.pop(oldest_id)[1].cancel()
+
+@app.teardown_request
+def release_email_connection(exc):
+    # Hand the request's IMAP connection back to the pool
+    email_service.release()
+
 @app.route('/')
 def index():
     if 'logged_in' not in session:
@@ -40,7 +67,13 @@ def login():
             session['email'] = form.email.data
             session['server'] = form.server.data
             session['port'] = form.port.data
-            session['password'] = form.password.data  # Note: In production, use more secure methods
+            # The password stays server-side; the cookie only carries an opaque token
+            session['account'] = email_service.store_credentials(
+                username=form.email.data,
+                password=form.password.data,
+                server=form.server.data,
+                port=form.port.data
+            )
             flash('Login successful!', 'success')
             return redirect(url_for('index'))
         except Exception as e:
@@ -50,6 +83,7 @@ def login():
 
 @app.route('/logout')
 def logout():
+    email_service.forget_credentials(session.get('account'))
     session.clear()
     flash('You have been logged out.', 'info')
     return redirect(url_for('login'))
@@ -60,13 +94,8 @@ def fetch_emails():
         return jsonify({'error': 'Not logged in'}), 401
     
     try:
-        # Reconnect to ensure the connection is fresh
-        email_service.connect(
-            username=session['email'],
-            password=session['password'],
-            server=session['server'],
-            port=session['port']
-        )
+        # Reuse a pooled connection for this account, reconnecting only if it has dropped
+        email_service.connect_with_token(session.get('account'))
         
         # Fetch emails (default to inbox and last 10 emails)
         folder = request.args.get('folder', 'INBOX')
@@ -74,6 +103,9 @@ def fetch_emails():
         emails = email_service.fetch_emails(folder=folder, limit=limit)
         
         return jsonify(emails)
+    except PermissionError as e:
+        session.clear()
+        return jsonify({'error': str(e)}), 401
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -85,48 +117,77 @@ def analyze_email():
     form = AnalysisRequestForm()
     if form.validate_on_submit():
         email_id = form.email_id.data
+        folder = form.folder.data or 'INBOX'
         analysis_type = form.analysis_type.data
         
         try:
-            # Reconnect to ensure the connection is fresh
-            email_service.connect(
-                username=session['email'],
-                password=session['password'],
-                server=session['server'],
-                port=session['port']
-            )
+            # Reuse a pooled connection for this account, reconnecting only if it has dropped
+            email_service.connect_with_token(session.get('account'))
             
             # Get the full email content
-            email_content = email_service.get_email_content(email_id)
+            email_content = email_service.get_email_content(email_id, folder=folder)
             
-            # Analyze the email
-            analysis_result = ai_analyzer.analyze_email(
+            # Analyze the email in the background; the client polls for the result
+            job_id = uuid.uuid4().hex
+            future = analysis_executor.submit(
+                ai_analyzer.analyze_email,
                 email_content=email_content,
                 analysis_type=analysis_type
             )
+            with analysis_jobs_lock:
+                now = time.monotonic()
+                _prune_analysis_jobs(now)
+                analysis_jobs[job_id] = (session.get('account'), future, now)
             
-            return jsonify(analysis_result)
+            return jsonify({'job_id': job_id}), 202
+        except PermissionError as e:
+            session.clear()
+            return jsonify({'error': str(e)}), 401
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     return jsonify({'error': 'Invalid form data'}), 400
 
+@app.route('/analyze-email/result/<job_id>')
+def analysis_result(job_id):
+    if 'logged_in' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    with analysis_jobs_lock:
+        job = analysis_jobs.get(job_id)
+        if job is None or job[0] != session.get('account'):
+            _prune_analysis_jobs(time.monotonic())
+            return jsonify({'error': 'Unknown analysis job'}), 404
+        
+        _, future, created_at = job
+        if time.monotonic() - created_at > ANALYSIS_JOB_TTL_SECONDS:
+            _prune_analysis_jobs(time.monotonic())
+            return jsonify({'error': 'Analysis job expired'}), 410
+        
+        if not future.done():
+            return jsonify({'status': 'pending'}), 202
+        
+        # Each result is handed out once
+        del analysis_jobs[job_id]
+    try:
+        return jsonify(future.result())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/folders')
 def get_folders():
     if 'logged_in' not in session:
         return jsonify({'error': 'Not logged in'}), 401
     
     try:
-        # Reconnect to ensure the connection is fresh
-        email_service.connect(
-            username=session['email'],
-            password=session['password'],
-            server=session['server'],
-            port=session['port']
-        )
+        # Reuse a pooled connection for this account, reconnecting only if it has dropped
+        email_service.connect_with_token(session.get('account'))
         
         folders = email_service.list_folders()
         return jsonify(folders)
+    except PermissionError as e:
+        session.clear()
+        return jsonify({'error': str(e)}), 401
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
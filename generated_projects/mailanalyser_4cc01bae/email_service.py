@@ -2,32 +2,132 @@ import imaplib
 import email
 from email.header import decode_header
 import re
+import secrets
+import threading
 from datetime import datetime
 
+# Idle logged-in connections kept per (username, server, port)
+MAX_IDLE_CONNECTIONS = 4
+
+# The listing only needs headers and enough body for a preview; PEEK leaves messages unread
+PREVIEW_BYTES = 4096
+LISTING_FETCH = f'(BODY.PEEK[HEADER] BODY.PEEK[TEXT]<0.{PREVIEW_BYTES}>)'
+
+# Start of one message's data in a FETCH response, e.g. b'12 (BODY[HEADER] {342}'
+_FETCH_START_RE = re.compile(rb'(\d+) \(')
+# UID of a message, from a FETCH response item
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+# Section a literal belongs to, from the end of its prefix, e.g. b'BODY[TEXT]<0>' in b' BODY[TEXT]<0> {4096}'
+_FETCH_SECTION_RE = re.compile(rb'(BODY\[[^\]]*\](?:<\d+>)?) \{\d+\}$')
+
+# Simple HTML to text conversion; works on the raw bytes since UTF-8 never puts '<' or '>' inside a character
+_HTML_TAG_RE = re.compile(rb'<[^<]+?>')
+
 class EmailService:
     def __init__(self):
-        self.connection = None
-        self.username = None
+        # Each request thread works on its own checked-out connection
+        self._local = threading.local()
+        self._pool = {}
+        self._credentials = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def connection(self):
+        return getattr(self._local, 'connection', None)
+    
+    @connection.setter
+    def connection(self, value):
+        self._local.connection = value
+    
+    @property
+    def username(self):
+        return getattr(self._local, 'key', (None,))[0]
     
     def connect(self, username, password, server, port=993):
-        """Connect to the email server"""
+        """Connect to the email server, reusing an idle pooled connection when one is still alive"""
+        self.release()
+        key = (username, server, port)
+        self.connection = self._checkout(key)
+        self._local.key = key
+        if self.connection is not None:
+            return True
         try:
-            self.connection = imaplib.IMAP4_SSL(server, port)
-            self.connection.login(username, password)
-            self.username = username
+            connection = imaplib.IMAP4_SSL(server, port)
+            connection.login(username, password)
+            self.connection = connection
             return True
         except Exception as e:
             raise Exception(f"Failed to connect to email server: {str(e)}")
     
+    def _checkout(self, key):
+        """Take an idle connection for key from the pool, dropping any the server has closed"""
+        while True:
+            with self._lock:
+                idle = self._pool.get(key)
+                if not idle:
+                    return None
+                connection = idle.pop()
+            try:
+                connection.noop()
+                return connection
+            except (imaplib.IMAP4.error, OSError):
+                self._logout(connection)
+    
+    def release(self):
+        """Return the current connection to the pool for the next request"""
+        connection = self.connection
+        if connection is None:
+            return
+        self.connection = None
+        with self._lock:
+            idle = self._pool.setdefault(self._local.key, [])
+            if len(idle) < MAX_IDLE_CONNECTIONS:
+                idle.append(connection)
+                return
+        self._logout(connection)
+    
+    def store_credentials(self, username, password, server, port=993):
+        """Keep login details server-side and return an opaque token for the session cookie"""
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._credentials[token] = (username, password, server, port)
+        return token
+    
+    def connect_with_token(self, token):
+        """Connect using credentials stored by store_credentials"""
+        with self._lock:
+            credentials = self._credentials.get(token)
+        if credentials is None:
+            raise PermissionError("Session expired, please log in again")
+        return self.connect(*credentials)
+    
+    def forget_credentials(self, token):
+        """Drop stored credentials and close the account's idle connections"""
+        with self._lock:
+            credentials = self._credentials.pop(token, None)
+            if credentials is None:
+                return
+            username, _, server, port = credentials
+            # Other sessions for the same account keep using the pool
+            if any((c[0], c[2], c[3]) == (username, server, port) for c in self._credentials.values()):
+                return
+            idle = self._pool.pop((username, server, port), [])
+        for connection in idle:
+            self._logout(connection)
+    
     def disconnect(self):
         """Disconnect from the email server"""
         if self.connection:
-            try:
-                self.connection.logout()
-            except:
-                pass  # Ignore errors during logout
+            self._logout(self.connection)
             self.connection = None
     
+    @staticmethod
+    def _logout(connection):
+        try:
+            connection.logout()
+        except:
+            pass  # Ignore errors during logout
+    
     def list_folders(self):
         """List all available folders/mailboxes"""
         if not self.connection:
@@ -50,13 +150,10 @@ class EmailService:
         if not self.connection:
             raise Exception("Not connected to email server")
         
-        # Select the mailbox/folder
-        result, data = self.connection.select(folder)
-        if result != 'OK':
-            raise Exception(f"Failed to select folder: {folder}")
+        self._select(folder)
         
-        # Search for all emails in the folder
-        result, data = self.connection.search(None, 'ALL')
+        # Search for all emails in the folder; UIDs stay valid across connections and expunges
+        result, data = self.connection.uid('SEARCH', None, 'ALL')
         if result != 'OK':
             raise Exception("Failed to search for emails")
         
@@ -68,14 +165,20 @@ class EmailService:
             email_ids = email_ids[-limit:]
         
         emails = []
+        if not email_ids:
+            return emails
+        
+        # One FETCH for the whole listing instead of a round-trip per message
+        result, data = self.connection.uid('FETCH', self._sequence_set(email_ids), LISTING_FETCH)
+        if result != 'OK':
+            raise Exception("Failed to fetch emails")
+        fetched = self._group_fetch_response(data)
         
         for email_id in reversed(email_ids):  # Process newest first
-            result, data = self.connection.fetch(email_id, '(RFC822)')
-            if result != 'OK':
+            sections = fetched.get(email_id)
+            if not sections or b'BODY[HEADER]' not in sections:
                 continue
-            
-            raw_email = data[0][1]
-            msg = email.message_from_bytes(raw_email)
+            msg = self._preview_message(sections[b'BODY[HEADER]'], sections.get(b'BODY[TEXT]<0>', b''))
             
             # Extract email details
             subject = self._decode_email_header(msg['Subject'])
@@ -99,18 +202,22 @@ class EmailService:
                 'from': from_addr,
                 'date': date,
                 'preview': body_preview,
-                'has_attachments': self._has_attachments(msg)
+                # Attachments usually sit past the preview, so also go by the top-level type
+                'has_attachments': msg.get_content_type() == 'multipart/mixed' or self._has_attachments(msg)
             })
         
         return emails
     
-    def get_email_content(self, email_id):
-        """Get the full content of a specific email"""
+    def get_email_content(self, email_id, folder='INBOX'):
+        """Get the full content of a specific email by its UID in folder"""
         if not self.connection:
             raise Exception("Not connected to email server")
         
-        result, data = self.connection.fetch(email_id.encode(), '(RFC822)')
-        if result != 'OK':
+        # Pooled connections carry whatever mailbox an earlier request selected
+        self._select(folder)
+        
+        result, data = self.connection.uid('FETCH', email_id.encode(), '(RFC822)')
+        if result != 'OK' or not data or not isinstance(data[0], tuple):
             raise Exception(f"Failed to fetch email with ID: {email_id}")
         
         raw_email = data[0][1]
@@ -159,6 +266,50 @@ class EmailService:
             'attachments': attachments
         }
     
+    def _select(self, folder):
+        """Open folder read-only on the current connection"""
+        result, data = self.connection.select(folder, readonly=True)
+        if result != 'OK':
+            raise Exception(f"Failed to select folder: {folder}")
+    
+    @staticmethod
+    def _sequence_set(email_ids):
+        """IMAP sequence set for the ids, as a range when they are contiguous"""
+        first, last = int(email_ids[0]), int(email_ids[-1])
+        if last - first + 1 == len(email_ids):
+            return f'{first}:{last}'.encode()
+        return b','.join(email_ids)
+    
+    @staticmethod
+    def _group_fetch_response(data):
+        """Map each message UID in a multi-message UID FETCH response to {section: literal}"""
+        by_sequence = {}
+        current = None
+        for part in data:
+            # Literals arrive as (prefix, bytes) tuples; closing ')' lines, trailing
+            # ' UID n)' items and unsolicited FLAGS updates arrive as plain bytes
+            prefix = part[0] if isinstance(part, tuple) else part
+            match = _FETCH_START_RE.match(prefix)
+            if match:
+                current = by_sequence.setdefault(match.group(1), {'uid': None, 'sections': {}})
+            if current is None:
+                continue
+            uid = _FETCH_UID_RE.search(prefix)
+            if uid:
+                current['uid'] = uid.group(1)
+            # Servers may return the items in any order, so key them by section
+            section = _FETCH_SECTION_RE.search(prefix) if isinstance(part, tuple) else None
+            if section:
+                current['sections'][section.group(1)] = part[1]
+        return {entry['uid']: entry['sections'] for entry in by_sequence.values() if entry['uid'] and entry['sections']}
+    
+    def _preview_message(self, header, text=b''):
+        """Parse a message from its header and the start of its body"""
+        if len(text) >= PREVIEW_BYTES:
+            # Cut at a line end so truncated base64/quoted-printable lines still decode
+            text = text[:text.rfind(b'\n') + 1]
+        return email.message_from_bytes(header + text)
+    
     def _decode_email_header(self, header):
         """Decode email header"""
         if header is None:
@@ -200,9 +351,8 @@ class EmailService:
                         pass
                 elif content_type == 'text/html' and not body:
                     try:
-                        html = part.get_payload(decode=True).decode('utf-8', errors='replace')
-                        # Simple HTML to text conversion
-                        body = re.sub('<[^<]+?>', '', html)
+                        html = part.get_payload(decode=True)
+                        body = _HTML_TAG_RE.sub(b'', html).decode('utf-8', errors='replace')
                     except:
                         pass
             
@@ -210,11 +360,10 @@ class EmailService:
         else:
             # Not multipart - get the content directly
             try:
-                body = msg.get_payload(decode=True).decode('utf-8', errors='replace')
+                payload = msg.get_payload(decode=True)
                 if msg.get_content_type() == 'text/html':
-                    # Simple HTML to text conversion
-                    body = re.sub('<[^<]+?>', '', body)
-                return body
+                    payload = _HTML_TAG_RE.sub(b'', payload)
+                return payload.decode('utf-8', errors='replace')
             except:
                 return ''
     
@@ -10,6 +10,7 @@ class LoginForm(FlaskForm):
 
 class AnalysisRequestForm(FlaskForm):
     email_id = HiddenField('Email ID', validators=[DataRequired()])
+    folder = HiddenField('Folder', default='INBOX')
     analysis_type = SelectField('Analysis Type', choices=[
         ('summary', 'Summarize Email'),
         ('sentiment', 'Analyze Sentiment'),
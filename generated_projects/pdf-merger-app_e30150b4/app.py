@@ -1,34 +1,105 @@
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, request, send_file, send_from_directory, jsonify
 from flask_cors import CORS
 import os
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PyPDF2 import PdfMerger
 from werkzeug.utils import secure_filename
 import uuid
 from datetime import datetime
 
+# PyMuPDF merges in C; fall back to pure-Python PyPDF2 when it isn't installed
+try:
+    import fitz
+    FITZ_AVAILABLE = True
+except ImportError:
+    FITZ_AVAILABLE = False
+
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-MERGED_FOLDER = 'merged'
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MERGED_FOLDER'] = MERGED_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+# Let browsers reuse script.js/styles.css for an hour instead of revalidating every load
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
+
+# Merged PDFs are kept in memory for the follow-up download, oldest dropped past this many bytes
+MAX_MERGED_BYTES = 256 * 1024 * 1024
+merged_outputs = OrderedDict()  # filename -> PDF bytes
+merged_outputs_lock = threading.Lock()
+
+# Upper bound on threads reading source PDFs off disk for one merge
+MAX_READ_WORKERS = 8
 
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(MERGED_FOLDER, exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class InvalidPDFError(ValueError):
+    """An uploaded file could not be parsed as a PDF"""
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def read_pdf_sources(pdf_paths):
+    """Read every source file concurrently; the reads release the GIL"""
+    with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(pdf_paths))) as executor:
+        return list(executor.map(_read_file, pdf_paths))
+
+def merge_pdf_files(pdf_paths):
+    """Merge the PDFs in order and return the merged document's bytes"""
+    sources = read_pdf_sources(pdf_paths)
+    
+    if FITZ_AVAILABLE:
+        merged = fitz.open()
+        try:
+            for pdf_path, data in zip(pdf_paths, sources):
+                try:
+                    source = fitz.open(stream=data, filetype='pdf')
+                except Exception:
+                    raise InvalidPDFError(f'Could not read {os.path.basename(pdf_path)} as a PDF')
+                with source:
+                    merged.insert_pdf(source)
+            # Drop unused objects and compress streams to keep the output small
+            return merged.tobytes(garbage=4, deflate=True)
+        finally:
+            merged.close()
+    
+    merger = PdfMerger()
+    for pdf_path, data in zip(pdf_paths, sources):
+        try:
+            merger.append(io.BytesIO(data))
+        except Exception:
+            merger.close()
+            raise InvalidPDFError(f'Could not read {os.path.basename(pdf_path)} as a PDF')
+    buffer = io.BytesIO()
+    merger.write(buffer)
+    merger.close()
+    return buffer.getvalue()
+
+def remember_merged_output(filename, pdf_bytes):
+    """Keep a merged PDF for /api/download, evicting the oldest past MAX_MERGED_BYTES"""
+    with merged_outputs_lock:
+        merged_outputs[filename] = pdf_bytes
+        total = sum(len(data) for data in merged_outputs.values())
+        while total > MAX_MERGED_BYTES and len(merged_outputs) > 1:
+            _, evicted = merged_outputs.popitem(last=False)
+            total -= len(evicted)
+
 @app.route('/')
 def index():
-    return app.send_static_file('index.html')
+    # Always revalidate the page itself; unchanged copies get a 304 from the ETag
+    return send_from_directory(app.static_folder, 'index.html', max_age=0)
 
 @app.route('/api/upload', methods=['POST'])
 def upload_files():
@@ -89,20 +160,23 @@ def merge_pdfs():
         if len(pdf_files) < 2:
             return jsonify({'error': 'At least 2 PDF files required'}), 400
         
-        # Merge PDFs
-        merger = PdfMerger()
+        # Merge in memory; nothing is written to disk
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        merged_filename = f'merged_{timestamp}_{session_id[:8]}.pdf'
         
-        for pdf_file in pdf_files:
-            pdf_path = os.path.join(session_folder, pdf_file)
-            merger.append(pdf_path)
+        pdf_paths = [os.path.join(session_folder, pdf_file) for pdf_file in pdf_files]
+        pdf_bytes = merge_pdf_files(pdf_paths)
         
-        # Save merged PDF
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        merged_filename = f'merged_{timestamp}.pdf'
-        merged_path = os.path.join(app.config['MERGED_FOLDER'], merged_filename)
+        # Clients that ask for it get the PDF in this response, saving the second request
+        if data.get('download'):
+            return send_file(
+                io.BytesIO(pdf_bytes),
+                as_attachment=True,
+                download_name=merged_filename,
+                mimetype='application/pdf'
+            )
         
-        merger.write(merged_path)
-        merger.close()
+        remember_merged_output(merged_filename, pdf_bytes)
         
         return jsonify({
             'success': True,
@@ -110,19 +184,22 @@ def merge_pdfs():
             'download_url': f'/api/download/{merged_filename}'
         }), 200
         
+    except InvalidPDFError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Merge failed: {str(e)}'}), 500
 
 @app.route('/api/download/<filename>', methods=['GET'])
 def download_file(filename):
     try:
-        file_path = os.path.join(app.config['MERGED_FOLDER'], filename)
+        with merged_outputs_lock:
+            pdf_bytes = merged_outputs.get(filename)
         
-        if not os.path.exists(file_path):
+        if pdf_bytes is None:
             return jsonify({'error': 'File not found'}), 404
         
         return send_file(
-            file_path,
+            io.BytesIO(pdf_bytes),
             as_attachment=True,
             download_name=filename,
             mimetype='application/pdf'
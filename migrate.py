@@ -0,0 +1,14 @@
+"""
+migrate.py — Database schema setup for GenStack / StackGPT
+----------------------------------------------------------
+Creates the MySQL database, tables and stored procedures the server needs,
+and applies in-place upgrades to existing schemas. Safe to re-run.
+
+Usage:
+    python migrate.py
+"""
+
+from database import create_database_and_tables
+
+if __name__ == "__main__":
+    create_database_and_tables()
@@ -0,0 +1,26 @@
+"""bcrypt password hashing, kept free of database imports so the auth worker
+processes can load it on their own."""
+import os
+
+import bcrypt
+
+# Each extra round doubles bcrypt's cost; 10 keeps logins fast while existing
+# hashes at other costs still verify. Raise it where offline cracking
+# resistance matters more than login throughput.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+def hash_password(password: str) -> str:
+    """Hash a password"""
+    password_bytes = password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("ascii")
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash"""
+    password_bytes = plain_password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
+    try:
+        return bcrypt.checkpw(password_bytes, hashed_password.encode("ascii"))
+    except ValueError:
+        # Malformed or non-bcrypt hash
+        return False
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Optional
 
@@ -48,7 +49,9 @@ async def app_page():
 @router.post("/api/auth/signup")
 async def signup(request: SignupRequest):
     """User signup endpoint"""
-    result = create_user(request.name, request.email, request.password)
+    # Blocking DB + bcrypt work runs off the event loop
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, create_user, request.name, request.email, request.password)
 
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['message'])
@@ -63,7 +66,8 @@ async def signup(request: SignupRequest):
 @router.post("/api/auth/login")
 async def login(request: LoginRequest):
     """User login endpoint"""
-    result = authenticate_user(request.email, request.password)
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, authenticate_user, request.email, request.password)
 
     if not result['success']:
         raise HTTPException(status_code=401, detail=result['message'])
@@ -123,7 +127,8 @@ async def forgot_password(request: ForgotPasswordRequest, req: Request):
 @router.post("/api/auth/reset-password")
 async def reset_password_endpoint(request: ResetPasswordRequest):
     """Reset user password with a valid token"""
-    result = reset_password(request.token, request.new_password)
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, reset_password, request.token, request.new_password)
 
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['message'])
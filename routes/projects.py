@@ -19,7 +19,7 @@ from auth import get_user_from_token
 from token_usage_manager import global_token_manager
 from utils.file_ops import (
     scan_projects_directory, load_project_from_filesystem, save_project_to_filesystem,
-    get_project_response_data, get_file_content, save_chat_message_to_db,
+    get_project_response_data, get_file_content, save_chat_messages_to_db,
     get_chat_history_from_db, analyze_uploaded_files, process_zip_file, create_backup
 )
 from utils.project_runner import execute_project, stop_project, get_running_projects, detect_project_url
@@ -61,6 +61,10 @@ async def find_element_in_project(project_id: str, element_name: str):
         project = projects_store[project_id]
         elements = dynamic_ast_modifier.find_elements_in_project(project_id, project.project_name, element_name)
 
+        # Serialize nodes explicitly; FastAPI would otherwise fall back to dataclasses.asdict
+        for element in elements:
+            element["element"] = element["element"].to_dict()
+
         return {"elements": elements}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -75,8 +79,12 @@ async def refresh_project_ast_cache(project_id: str):
 
         project = projects_store[project_id]
 
-        for file in project.files:
-            dynamic_ast_modifier.refresh_file_ast(project_id, project.project_name, file.path, file.content)
+        # Parsing waits on the worker pool; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, dynamic_ast_modifier.refresh_project_ast,
+            project_id, project.project_name, {file.path: file.content for file in project.files}
+        )
 
         summary = dynamic_ast_modifier.get_project_ast_summary(project_id, project.project_name)
 
@@ -129,20 +137,21 @@ async def enhanced_code_assistant_api_with_intent_detection(
 
         project = projects_store[project_id]
 
-        save_chat_message_to_db(
-            user_id=user['id'],
-            project_id=project_id,
-            project_name=project.project_name,
-            message=request.message,
-            sender='user',
-            message_type='text'
-        )
+        user_message = {
+            'message': request.message,
+            'sender': 'user',
+            'message_type': 'text'
+        }
 
-        result = await detect_user_intent_and_respond(
-            project_id,
-            request.message,
-            request.context
-        )
+        try:
+            result = await detect_user_intent_and_respond(
+                project_id,
+                request.message,
+                request.context
+            )
+        except Exception:
+            save_chat_messages_to_db(user['id'], project_id, project.project_name, [user_message])
+            raise
 
         if isinstance(result, EnhancedCodeAssistantResponse):
             result_dict = result.dict()
@@ -156,19 +165,20 @@ async def enhanced_code_assistant_api_with_intent_detection(
                 'is_information_request': False
             }
 
-        save_chat_message_to_db(
-            user_id=user['id'],
-            project_id=project_id,
-            project_name=project.project_name,
-            message=result_dict.get('explanation', 'No response'),
-            sender='assistant',
-            message_type='text',
-            metadata={
-                'affected_files': result_dict.get('affected_files', []),
-                'new_files': result_dict.get('new_files', []),
-                'success': result_dict.get('success', False)
+        # Both sides of the exchange go to the database in one INSERT
+        save_chat_messages_to_db(user['id'], project_id, project.project_name, [
+            user_message,
+            {
+                'message': result_dict.get('explanation', 'No response'),
+                'sender': 'assistant',
+                'message_type': 'text',
+                'metadata': {
+                    'affected_files': result_dict.get('affected_files', []),
+                    'new_files': result_dict.get('new_files', []),
+                    'success': result_dict.get('success', False)
+                }
             }
-        )
+        ])
 
         return result_dict
 
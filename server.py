@@ -6,6 +6,8 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from ast_cache_manager import shutdown_parse_pool
+from auth import start_bcrypt_pool, shutdown_bcrypt_pool
 from store import projects_store, running_processes, PROJECTS_DIR
 from utils.file_ops import scan_projects_directory, load_project_from_filesystem
 from utils.project_runner import stop_project
@@ -64,6 +66,7 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting Enhanced MCP Project Generator with Intelligent Code Assistant...")
 
+    start_bcrypt_pool()
     await preload_recent_projects()
 
     from services.mcp_tools import MCP_TOOLS
@@ -96,6 +99,9 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"Error stopping project {project_id}: {e}")
 
+    shutdown_bcrypt_pool()
+    shutdown_parse_pool()
+
     print("Shutdown complete")
 
 
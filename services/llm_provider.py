@@ -169,6 +169,7 @@ def stream_llm(
     temperature: float = 0.1,
     on_chunk: Optional[Callable[[str], None]] = None,
     response_format: str = "text",
+    stop_when: Optional[Callable[[str], bool]] = None,
 ) -> Tuple[str, int, int]:
     """
     Stream text from the active LLM provider.
@@ -184,6 +185,9 @@ def stream_llm(
                          When "json" and provider is Gemini, enables
                          response_mime_type="application/json" (constrained
                          decoding — guaranteed valid JSON output).
+        stop_when:       Optional predicate invoked with each chunk; returning
+                         True ends the stream early (token counts are then 0
+                         when the provider only reports them at the end).
 
     Returns:
         Tuple of (full_response_text, input_tokens, output_tokens).
@@ -191,9 +195,9 @@ def stream_llm(
     from store import PROVIDER
 
     if PROVIDER == "anthropic":
-        return _stream_anthropic(system, messages, max_tokens, temperature, on_chunk)
+        return _stream_anthropic(system, messages, max_tokens, temperature, on_chunk, stop_when)
     elif PROVIDER == "gemini":
-        return _stream_gemini(system, messages, max_tokens, temperature, on_chunk, response_format)
+        return _stream_gemini(system, messages, max_tokens, temperature, on_chunk, response_format, stop_when)
     else:
         raise RuntimeError(
             "No LLM provider configured. "
@@ -211,10 +215,11 @@ def _stream_anthropic(
     max_tokens: int,
     temperature: float,
     on_chunk: Optional[Callable[[str], None]],
+    stop_when: Optional[Callable[[str], bool]] = None,
 ) -> Tuple[str, int, int]:
     from store import client, DEFAULT_MODEL
 
-    response_content = ""
+    chunks = []  # joined once at the end; += on a growing str is quadratic
     input_tokens = 0
     output_tokens = 0
 
@@ -226,16 +231,19 @@ def _stream_anthropic(
         messages=messages,
     ) as stream_response:
         for text in stream_response.text_stream:
-            response_content += text
+            chunks.append(text)
             if on_chunk:
                 on_chunk(text)
+            if stop_when and stop_when(text):
+                # Leaving the context manager closes the connection mid-stream
+                return "".join(chunks), input_tokens, output_tokens
 
         final_message = stream_response.get_final_message()
         if hasattr(final_message, "usage"):
             input_tokens = final_message.usage.input_tokens
             output_tokens = final_message.usage.output_tokens
 
-    return response_content, input_tokens, output_tokens
+    return "".join(chunks), input_tokens, output_tokens
 
 
 # ---------------------------------------------------------------------------
@@ -249,6 +257,7 @@ def _stream_gemini(
     temperature: float,
     on_chunk: Optional[Callable[[str], None]],
     response_format: str = "text",
+    stop_when: Optional[Callable[[str], bool]] = None,
 ) -> Tuple[str, int, int]:
     import google.generativeai as genai
     from store import DEFAULT_MODEL
@@ -267,7 +276,7 @@ def _stream_gemini(
     )
 
     gemini_contents = _to_gemini_messages(messages)
-    response_content = ""
+    chunks = []
     input_tokens = 0
     output_tokens = 0
 
@@ -295,9 +304,11 @@ def _stream_gemini(
             except (ValueError, AttributeError):
                 text = ""
             if text:
-                response_content += text
+                chunks.append(text)
                 if on_chunk:
                     on_chunk(text)
+                if stop_when and stop_when(text):
+                    break
 
         # Token usage is available on the resolved response after streaming
         try:
@@ -311,6 +322,7 @@ def _stream_gemini(
         print(f"[ERROR][Gemini] API call failed: {e}")
         raise
 
+    response_content = "".join(chunks)
     print(f"[DEBUG][Gemini] response_length={len(response_content)} "
           f"tokens={input_tokens}+{output_tokens}")
     return response_content, input_tokens, output_tokens
@@ -2,8 +2,8 @@
 Shared pytest fixtures and setup for StackGPT tests.
 
 Key responsibilities:
-- Stub mysql.connector BEFORE database.py is imported (it calls
-  create_database_and_tables() at module level, which would fail without MySQL).
+- Stub mysql.connector BEFORE database.py is imported, so no live MySQL
+  server or installed driver is needed.
 - Provide a session-scoped FastAPI TestClient.
 - Provide a reusable sample ProjectResponse fixture.
 """
@@ -23,11 +23,20 @@ os.environ.setdefault("DB_PASSWORD", "test_pass")
 
 # ---------------------------------------------------------------------------
 # 2. Stub mysql.connector so database.py doesn't need a live MySQL server.
-#    database.py runs create_database_and_tables() on import; the mock
-#    connection/cursor silently no-ops every call.
+#    The mock connection/cursor silently no-ops every call.
 # ---------------------------------------------------------------------------
 _mock_mysql = MagicMock()
 _mock_mysql.Error = Exception          # `except Error` needs a real exception type
+
+
+class _IntegrityError(Exception):
+    def __init__(self, msg=None, errno=None):
+        super().__init__(msg)
+        self.errno = errno
+
+
+_mock_mysql.IntegrityError = _IntegrityError
+_mock_mysql.pooling.CNX_POOL_MAXSIZE = 32  # mysql-connector's hard pool_size limit
 sys.modules.setdefault("mysql", MagicMock())
 sys.modules.setdefault("mysql.connector", _mock_mysql)
 
@@ -0,0 +1,387 @@
+"""Tests for the JSON-backed AST cache in ast_cache_manager.py.
+
+A stub AST processor stands in for MultiLanguageASTProcessor so the tests
+exercise only the cache bookkeeping (hashing, persistence, lookups).
+"""
+import pytest
+
+import ast_cache_manager
+from ast_cache_manager import ProjectASTCache
+
+
+SAMPLE_SOURCE = "def greet(name):\n    return name\n\nclass Greeter:\n    pass\n"
+
+SAMPLE_AST = {
+    "language": "python",
+    "parser_type": "python_ast",
+    "total_lines": 5,
+    "complexity_score": 2,
+    "functions": [{"name": "greet", "line": 1, "end_line": 2, "args": ["name"]}],
+    "classes": [{"name": "Greeter", "line": 4, "end_line": 5, "methods": []}],
+    "imports": [],
+    "variables": [],
+}
+
+
+class StubProcessor:
+    def __init__(self):
+        self.parse_calls = 0
+
+    def detect_language(self, file_path):
+        return "python"
+
+    def parse_code(self, content, language):
+        self.parse_calls += 1
+        return SAMPLE_AST
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+
+
+# ---------------------------------------------------------------------------
+# Hashing
+# ---------------------------------------------------------------------------
+
+class TestHashing:
+    def test_str_and_bytes_content_hash_identically(self, cache):
+        assert cache._get_file_hash("a.py", SAMPLE_SOURCE) == \
+            cache._get_file_hash("a.py", SAMPLE_SOURCE.encode("utf-8"))
+
+    def test_path_hash_matches_content_hash(self, cache, tmp_path):
+        source_file = tmp_path / "app.py"
+        source_file.write_text(SAMPLE_SOURCE)
+        assert cache._get_file_hash("app.py", source_file) == cache._get_file_hash("app.py", SAMPLE_SOURCE)
+
+    def test_different_content_changes_hash(self, cache):
+        assert cache._get_file_hash("a.py", "x = 1") != cache._get_file_hash("a.py", "x = 2")
+
+    def test_cache_filename_is_short_and_stable(self, cache):
+        name = cache._get_cache_filename("src/app.py")
+        assert name == cache._get_cache_filename("src/app.py")
+        stem, _, suffix = name.partition(".")
+        assert len(stem) == len("0123456789abcdef")
+        assert suffix in ("json", "json.zst")
+
+
+# ---------------------------------------------------------------------------
+# get_or_parse_ast / persistence
+# ---------------------------------------------------------------------------
+
+class TestGetOrParse:
+    def test_second_call_uses_cache(self, cache):
+        processor = StubProcessor()
+        first = cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, processor)
+        second = cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, processor)
+        assert processor.parse_calls == 1
+        assert first.functions[0].name == "greet"
+        assert second.classes[0].name == "Greeter"
+
+    def test_changed_content_is_reparsed(self, cache):
+        processor = StubProcessor()
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, processor)
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE + "\n# edit\n", processor)
+        assert processor.parse_calls == 2
+
+    def test_accepts_bytes_content(self, cache):
+        processor = StubProcessor()
+        file_ast = cache.get_or_parse_ast("app.py", SAMPLE_SOURCE.encode("utf-8"), processor)
+        assert file_ast.language == "python"
+        assert cache.is_file_cached_and_valid("app.py", SAMPLE_SOURCE)
+
+    def test_accepts_path_content(self, cache, tmp_path):
+        source_file = tmp_path / "app.py"
+        source_file.write_text(SAMPLE_SOURCE)
+        processor = StubProcessor()
+        cache.get_or_parse_ast("app.py", source_file, processor)
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, processor)
+        assert processor.parse_calls == 1
+
+    def test_unchanged_path_skips_hashing(self, cache, tmp_path):
+        from unittest.mock import patch
+        source_file = tmp_path / "app.py"
+        source_file.write_text(SAMPLE_SOURCE)
+        cache.get_or_parse_ast("app.py", source_file, StubProcessor())
+        with patch.object(cache, "_get_path_hash") as path_hash:
+            assert cache.is_file_cached_and_valid("app.py", source_file)
+        path_hash.assert_not_called()
+
+    def test_touched_path_with_same_content_is_still_valid(self, cache, tmp_path):
+        import os
+        source_file = tmp_path / "app.py"
+        source_file.write_text(SAMPLE_SOURCE)
+        cache.get_or_parse_ast("app.py", source_file, StubProcessor())
+        st = source_file.stat()
+        os.utime(source_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        assert cache.is_file_cached_and_valid("app.py", source_file)
+        source_file.write_text(SAMPLE_SOURCE + "# changed\n")
+        assert not cache.is_file_cached_and_valid("app.py", source_file)
+
+    def test_cache_survives_reload_from_disk(self, cache, tmp_path):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        reloaded = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+        assert reloaded.is_file_cached_and_valid("app.py", SAMPLE_SOURCE)
+        file_ast = reloaded.get_cached_ast("app.py")
+        assert file_ast is not None
+        assert file_ast.functions[0].parameters == ["name"]
+
+
+# ---------------------------------------------------------------------------
+# Summary and lookups
+# ---------------------------------------------------------------------------
+
+class TestQueries:
+    def test_project_summary_counts(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        summary = cache.get_project_ast_summary()
+        assert summary["total_files"] == 1
+        assert summary["total_functions"] == 1
+        assert summary["total_classes"] == 1
+        assert summary["total_lines"] == 5
+        assert summary["languages"] == {"python": 1}
+
+    def test_project_summary_reads_only_the_index(self, cache):
+        from unittest.mock import patch
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        cache._memory_cache.clear()
+        with patch.object(cache, "_load_cached_ast_from_disk") as load:
+            summary = cache.get_project_ast_summary()
+        load.assert_not_called()
+        assert summary["files"] == [{
+            "file_path": "app.py", "language": "python", "functions": 1,
+            "classes": 1, "lines": 5, "complexity": 2,
+        }]
+
+    def test_legacy_index_entries_are_upgraded_on_load(self, cache, tmp_path):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        for key in ("elements", "num_functions", "num_classes", "total_lines", "complexity_score"):
+            del cache._index_cache["app.py"][key]
+        cache._save_index()
+        reloaded = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+        assert reloaded.get_project_ast_summary()["total_functions"] == 1
+        assert [r["name"] for r in reloaded.find_elements_by_name("greet")] == ["greet", "Greeter"]
+
+    def test_find_elements_by_name_is_case_insensitive_substring(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        results = cache.find_elements_by_name("GREET")
+        assert {(r["type"], r["name"]) for r in results} == {
+            ("function", "greet"), ("class", "Greeter"),
+        }
+        assert results[0]["element"].start_line in (1, 4)
+
+    def test_find_elements_by_name_no_match(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        assert cache.find_elements_by_name("missing") == []
+
+    def test_find_elements_skips_files_without_matches(self, cache):
+        from unittest.mock import patch
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        cache._memory_cache.clear()
+        with patch.object(cache, "get_cached_ast", wraps=cache.get_cached_ast) as load:
+            assert cache.find_elements_by_name("missing") == []
+        load.assert_not_called()
+
+    def test_find_elements_on_cold_cache_builds_only_matched_nodes(self, cache):
+        from unittest.mock import patch
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        cache._memory_cache.clear()
+        with patch.object(cache, "_dict_to_file_ast") as rehydrate:
+            results = cache.find_elements_by_name("greeter")
+        rehydrate.assert_not_called()
+        assert [r["element"].name for r in results] == ["Greeter"]
+        assert "app.py" not in cache._memory_cache
+
+    def test_find_elements_reflects_reparsed_file(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        renamed = dict(SAMPLE_AST, functions=[{"name": "wave", "line": 1, "end_line": 2}])
+        cache.cache_ast("app.py", SAMPLE_SOURCE + "\n", renamed)
+        assert [r["name"] for r in cache.find_elements_by_name("greet")] == ["Greeter"]
+        assert [r["name"] for r in cache.find_elements_by_name("wave")] == ["wave"]
+
+    def test_find_elements_lists_files_in_index_order(self, cache):
+        file_names = ["zeta.py", "alpha.py", "mid.py", "beta.py"]
+        for file_name in file_names:
+            stem = file_name[:-3]
+            ast_result = dict(SAMPLE_AST, functions=[{"name": f"greet_{stem}", "line": 1, "end_line": 2}])
+            cache.cache_ast(file_name, f"# {stem}\n" + SAMPLE_SOURCE, ast_result)
+        results = cache.find_elements_by_name("greet_")
+        assert [r["file_path"] for r in results] == file_names
+
+    def test_short_and_long_substring_queries(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        assert {r["name"] for r in cache.find_elements_by_name("re")} == {"greet", "Greeter"}
+        assert [r["name"] for r in cache.find_elements_by_name("eete")] == ["Greeter"]
+        assert cache.find_elements_by_name("greetx") == []
+
+    def test_trigram_index_pruned_when_names_disappear(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        cache.invalidate_file("app.py")
+        assert cache._name_index == {}
+        assert cache._name_trigrams == {}
+
+    def test_invalidated_file_drops_out_of_name_index(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        cache.invalidate_file("app.py")
+        assert cache.find_elements_by_name("greet") == []
+        assert not cache.is_file_cached_and_valid("app.py", SAMPLE_SOURCE)
+
+    def test_name_index_rebuilt_on_reload(self, cache, tmp_path):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        reloaded = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+        assert [r["name"] for r in reloaded.find_elements_by_name("greeter")] == ["Greeter"]
+
+
+# ---------------------------------------------------------------------------
+# Serialization
+# ---------------------------------------------------------------------------
+
+class TestToDict:
+    def test_node_to_dict_matches_asdict(self, cache):
+        from dataclasses import asdict
+        file_ast = cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        node = file_ast.functions[0]
+        assert node.to_dict() == asdict(node)
+
+    def test_file_to_dict_matches_asdict(self, cache):
+        from dataclasses import asdict
+        file_ast = cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        assert file_ast.to_dict() == asdict(file_ast)
+
+
+# ---------------------------------------------------------------------------
+# Bulk index writes
+# ---------------------------------------------------------------------------
+
+class TestBulkCache:
+    def test_index_written_once_per_batch(self, cache):
+        from unittest.mock import patch
+        processor = StubProcessor()
+        with patch.object(cache, "_save_index", wraps=cache._save_index) as save:
+            with cache.bulk_cache():
+                for name in ("a.py", "b.py", "c.py"):
+                    cache.get_or_parse_ast(name, SAMPLE_SOURCE, processor)
+                assert not cache.index_file.exists()
+        # three deferred calls inside the batch plus one flush on exit
+        assert save.call_count == 4
+        assert cache.index_file.exists()
+
+    def test_index_is_reloadable_after_batch(self, cache, tmp_path):
+        with cache.bulk_cache():
+            cache.get_or_parse_ast("a.py", SAMPLE_SOURCE, StubProcessor())
+        reloaded = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+        assert reloaded.is_file_cached_and_valid("a.py", SAMPLE_SOURCE)
+        assert not list(cache.project_cache_dir.glob("*.tmp"))
+
+
+# ---------------------------------------------------------------------------
+# Memory cache bound
+# ---------------------------------------------------------------------------
+
+class TestMemoryCache:
+    def test_memory_cache_evicts_least_recently_used(self, tmp_path):
+        cache = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path),
+                                memory_cache_size=2)
+        processor = StubProcessor()
+        for name in ("a.py", "b.py"):
+            cache.get_or_parse_ast(name, SAMPLE_SOURCE, processor)
+        cache.get_cached_ast("a.py")  # touch a.py so b.py is the oldest
+        cache.get_or_parse_ast("c.py", SAMPLE_SOURCE, processor)
+        assert list(cache._memory_cache) == ["a.py", "c.py"]
+
+    def test_evicted_file_reloads_from_disk(self, tmp_path):
+        cache = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path),
+                                memory_cache_size=1)
+        processor = StubProcessor()
+        cache.get_or_parse_ast("a.py", SAMPLE_SOURCE, processor)
+        cache.get_or_parse_ast("b.py", SAMPLE_SOURCE, processor)
+        assert "a.py" not in cache._memory_cache
+        assert cache.get_cached_ast("a.py").functions[0].name == "greet"
+        assert processor.parse_calls == 2
+
+    def test_get_cached_asts_loads_misses_and_keeps_order(self, cache):
+        processor = StubProcessor()
+        for name in ("a.py", "b.py", "c.py"):
+            cache.get_or_parse_ast(name, SAMPLE_SOURCE, processor)
+        cache._memory_cache.clear()
+        cache.get_cached_ast("b.py")
+        loaded = cache.get_cached_asts(["c.py", "a.py", "b.py", "missing.py"])
+        assert list(loaded) == ["c.py", "a.py", "b.py"]
+        assert set(cache._memory_cache) == {"a.py", "b.py", "c.py"}
+
+
+# ---------------------------------------------------------------------------
+# find_elements_in_file
+# ---------------------------------------------------------------------------
+
+class TestFindElementsInFile:
+    def test_nodes_carry_lowercased_name(self, cache):
+        file_ast = cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        assert file_ast.classes[0].name_lower == "greeter"
+
+    def test_filters_case_insensitively(self, cache):
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        assert [r["name"] for r in cache.find_elements_in_file("app.py", "GREETER")] == ["Greeter"]
+        assert len(cache.find_elements_in_file("app.py")) == 2
+
+
+# ---------------------------------------------------------------------------
+# Blob compression
+# ---------------------------------------------------------------------------
+
+class TestBlobCompression:
+    def test_plain_json_blob_round_trips_without_zstd(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ast_cache_manager, "ZSTD_AVAILABLE", False)
+        cache = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        blob = cache.files_cache_dir / cache._index_cache["app.py"]["cache_filename"]
+        assert blob.name.endswith(".json")
+        assert blob.read_bytes().startswith(b"{")
+        cache._memory_cache.clear()
+        assert cache.get_cached_ast("app.py").functions[0].name == "greet"
+
+    def test_compressed_blob_round_trips(self, cache):
+        pytest.importorskip("zstandard")
+        cache.get_or_parse_ast("app.py", SAMPLE_SOURCE, StubProcessor())
+        blob = cache.files_cache_dir / cache._index_cache["app.py"]["cache_filename"]
+        assert blob.name.endswith(".json.zst")
+        assert blob.read_bytes()[:4] == ast_cache_manager._ZSTD_MAGIC
+        cache._memory_cache.clear()
+        assert cache.get_cached_ast("app.py").functions[0].name == "greet"
+
+    def test_recaching_removes_blob_under_old_name(self, tmp_path, monkeypatch):
+        pytest.importorskip("zstandard")
+        monkeypatch.setattr(ast_cache_manager, "ZSTD_AVAILABLE", False)
+        cache = ProjectASTCache("abcdef1234567890", "demo", base_cache_dir=str(tmp_path))
+        cache.cache_ast("app.py", SAMPLE_SOURCE, SAMPLE_AST)
+        monkeypatch.setattr(ast_cache_manager, "ZSTD_AVAILABLE", True)
+        cache.cache_ast("app.py", SAMPLE_SOURCE, SAMPLE_AST)
+        assert [p.name.endswith(".zst") for p in cache.files_cache_dir.iterdir()] == [True]
+
+
+# ---------------------------------------------------------------------------
+# Bulk parsing
+# ---------------------------------------------------------------------------
+
+class TestBulkParse:
+    def test_parses_stale_files_in_worker_processes(self, cache):
+        processor = StubProcessor()
+        result = cache.bulk_parse_and_cache({"a.py": SAMPLE_SOURCE, "b.py": SAMPLE_SOURCE}, processor)
+        assert list(result) == ["a.py", "b.py"]
+        assert result["b.py"].functions[0].name == "greet"
+        assert processor.parse_calls == 0  # parsing happened in the pool
+        assert cache.is_file_cached_and_valid("a.py", SAMPLE_SOURCE)
+        assert set(cache._index_cache) == {"a.py", "b.py"}
+
+    def test_single_stale_file_parses_in_process(self, cache):
+        processor = StubProcessor()
+        cache.get_or_parse_ast("a.py", SAMPLE_SOURCE, processor)
+        result = cache.bulk_parse_and_cache({"a.py": SAMPLE_SOURCE, "b.py": SAMPLE_SOURCE}, processor)
+        assert set(result) == {"a.py", "b.py"}
+        assert processor.parse_calls == 2
+
+    def test_parse_pool_never_forks_the_server(self, cache):
+        cache.bulk_parse_and_cache({"a.py": SAMPLE_SOURCE, "b.py": SAMPLE_SOURCE}, StubProcessor())
+        pool = ast_cache_manager._parse_pool
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert ast_cache_manager._get_parse_pool(StubProcessor) is pool
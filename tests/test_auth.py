@@ -1,12 +1,14 @@
 """Tests for authentication logic in auth.py.
 
-Pure crypto functions (hash/verify password, JWT) require no mocking.
+Pure crypto functions (hash/verify password, session tokens) require no mocking.
 Functions that touch the database (create_user, authenticate_user,
 get_user_from_token) use unittest.mock to inject a fake connection.
 """
 import pytest
 from unittest.mock import patch, MagicMock
 
+from mysql.connector import IntegrityError
+
 from auth import (
     hash_password,
     verify_password,
@@ -15,6 +17,11 @@ from auth import (
 )
 
 
+def _mock_row(mock_cursor, row):
+    """Make a mock cursor return one row as a tuple, in the dict's column order."""
+    mock_cursor.fetchone.return_value = tuple(row.values())
+
+
 # ---------------------------------------------------------------------------
 # Password hashing
 # ---------------------------------------------------------------------------
@@ -33,6 +40,29 @@ class TestPasswordHashing:
         hashed = hash_password("mysecret")
         assert verify_password("wrongpassword", hashed) is False
 
+    def test_hash_uses_configured_rounds(self):
+        from auth import BCRYPT_ROUNDS
+        assert hash_password("mysecret").split("$")[2] == f"{BCRYPT_ROUNDS:02d}"
+
+    def test_verifies_existing_hash_with_other_cost(self):
+        # Stored $2b$ rows keep verifying whatever cost they were created with
+        stored = "$2b$04$gLjxGEJe.9oTqAKjfkVxlObvc2sVfDik4FWhGyR0elmbmGj.4Etlu"
+        assert verify_password("mysecret", stored) is True
+        assert verify_password("wrong", stored) is False
+
+    def test_malformed_hash_does_not_verify(self):
+        assert verify_password("mysecret", "not-a-bcrypt-hash") is False
+
+    def test_worker_pool_hashes_and_verifies(self):
+        from auth import _run_bcrypt
+        hashed = _run_bcrypt(hash_password, "mysecret")
+        assert verify_password("mysecret", hashed) is True
+        assert _run_bcrypt(verify_password, "wrong", hashed) is False
+
+    def test_worker_pool_never_forks_the_server(self):
+        from auth import _get_bcrypt_pool
+        assert _get_bcrypt_pool()._mp_context.get_start_method() in ("forkserver", "spawn")
+
     def test_bcrypt_produces_unique_salts(self):
         h1 = hash_password("mysecret")
         h2 = hash_password("mysecret")
@@ -40,10 +70,10 @@ class TestPasswordHashing:
 
 
 # ---------------------------------------------------------------------------
-# JWT token creation and verification
+# Session token creation and verification
 # ---------------------------------------------------------------------------
 
-class TestJWT:
+class TestSessionToken:
     def test_create_token_returns_string(self):
         token = create_access_token({"user_id": 1, "email": "test@example.com"})
         assert isinstance(token, str)
@@ -55,7 +85,20 @@ class TestJWT:
         payload_out = verify_token(token)
         assert payload_out is not None
         assert payload_out["user_id"] == 42
-        assert payload_out["email"] == "alice@example.com"
+        assert payload_out["exp"] > 0
+
+    def test_token_is_fixed_length_base64url(self):
+        token = create_access_token({"user_id": 42})
+        assert len(token) == len(create_access_token({"user_id": 2**32 - 1}))
+        assert set(token) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+    def test_verify_rejects_token_signed_with_other_key(self):
+        import base64, hashlib, hmac
+        token = create_access_token({"user_id": 1})
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        forged_tag = hmac.new(b"other-key", raw[:12], hashlib.sha256).digest()
+        forged = base64.urlsafe_b64encode(raw[:12] + forged_tag).rstrip(b"=").decode()
+        assert verify_token(forged) is None
 
     def test_verify_garbage_token_returns_none(self):
         assert verify_token("not.a.valid.token") is None
@@ -69,6 +112,11 @@ class TestJWT:
     def test_verify_empty_string_returns_none(self):
         assert verify_token("") is None
 
+    def test_expired_token_is_rejected(self):
+        from datetime import timedelta
+        token = create_access_token({"user_id": 7}, expires_delta=timedelta(seconds=-1))
+        assert verify_token(token) is None
+
 
 # ---------------------------------------------------------------------------
 # create_user (DB-dependent)
@@ -87,21 +135,32 @@ class TestCreateUser:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value = mock_cursor
-        # Simulate existing user found
-        mock_cursor.fetchone.return_value = {"id": 1}
+        # Simulate the UNIQUE(email) constraint rejecting the INSERT
+        mock_cursor.execute.side_effect = IntegrityError("Duplicate entry", errno=1062)
 
         with patch("auth.get_db_connection", return_value=mock_conn):
             result = create_user("Bob", "existing@example.com", "pass123")
 
         assert result["success"] is False
         assert "already registered" in result["message"]
+        mock_conn.commit.assert_not_called()
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        from auth import create_user
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.execute.side_effect = IntegrityError("Column cannot be null", errno=1048)
+
+        with patch("auth.get_db_connection", return_value=mock_conn):
+            result = create_user("Bob", "bob@example.com", "pass123")
+
+        assert result["success"] is False
+        assert "already registered" not in result["message"]
 
     def test_successful_creation_returns_token_and_user(self):
         from auth import create_user
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = None   # no duplicate
         mock_cursor.lastrowid = 99
 
         with patch("auth.get_db_connection", return_value=mock_conn):
@@ -137,6 +196,8 @@ class TestAuthenticateUser:
 
         assert result["success"] is False
         assert "Invalid email or password" in result["message"]
+        mock_cursor.close.assert_called_once()
+        mock_conn.close.assert_called_once()
 
     def test_wrong_password(self):
         from auth import authenticate_user
@@ -144,10 +205,10 @@ class TestAuthenticateUser:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = {
+        _mock_row(mock_cursor, {
             "id": 1, "name": "Dave", "email": "dave@example.com",
             "password_hash": hashed, "is_active": True,
-        }
+        })
 
         with patch("auth.get_db_connection", return_value=mock_conn):
             result = authenticate_user("dave@example.com", "wrong_pass")
@@ -160,10 +221,10 @@ class TestAuthenticateUser:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = {
+        _mock_row(mock_cursor, {
             "id": 2, "name": "Eve", "email": "eve@example.com",
             "password_hash": hashed, "is_active": False,
-        }
+        })
 
         with patch("auth.get_db_connection", return_value=mock_conn):
             result = authenticate_user("eve@example.com", "pass123")
@@ -177,14 +238,165 @@ class TestAuthenticateUser:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = {
+        _mock_row(mock_cursor, {
             "id": 5, "name": "Frank", "email": "frank@example.com",
             "password_hash": hashed, "is_active": True,
-        }
+        })
 
-        with patch("auth.get_db_connection", return_value=mock_conn):
+        with patch("auth.get_db_connection", return_value=mock_conn), \
+                patch("auth._record_last_login") as record_last_login:
             result = authenticate_user("frank@example.com", "correct_pass")
 
         assert result["success"] is True
         assert result["user"]["email"] == "frank@example.com"
         assert "token" in result
+        record_last_login.assert_called_once_with(5)
+        mock_conn.commit.assert_not_called()
+
+    def test_last_logins_flush_in_one_statement(self):
+        from auth import _flush_last_logins
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+
+        with patch("auth.get_db_connection", return_value=mock_conn):
+            _flush_last_logins([3, 5, 8])
+
+        sql, params = mock_cursor.execute.call_args.args
+        assert "IN (%s, %s, %s)" in sql
+        assert params == (3, 5, 8)
+        mock_conn.commit.assert_called_once()
+        mock_conn.close.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# User cache
+# ---------------------------------------------------------------------------
+
+class TestAuthCaches:
+    @pytest.fixture(autouse=True)
+    def _clear_caches(self):
+        from auth import _user_cache
+        _user_cache.clear()
+        yield
+        _user_cache.clear()
+
+    def test_user_lookup_hits_db_once(self):
+        from auth import get_user_from_token
+        token = create_access_token({"user_id": 3})
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        _mock_row(mock_cursor, {"id": 3, "name": "Gina", "email": "gina@example.com"})
+
+        with patch("auth.get_db_connection", return_value=mock_conn) as get_conn:
+            first = get_user_from_token(token)
+            second = get_user_from_token(token)
+
+        assert first == second == {"id": 3, "name": "Gina", "email": "gina@example.com"}
+        assert get_conn.call_count == 1
+
+    def test_invalidate_user_forces_reload(self):
+        from auth import get_user_from_token, invalidate_user
+        token = create_access_token({"user_id": 3})
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        _mock_row(mock_cursor, {"id": 3, "name": "Gina", "email": "gina@example.com"})
+
+        with patch("auth.get_db_connection", return_value=mock_conn) as get_conn:
+            get_user_from_token(token)
+            invalidate_user(3)
+            get_user_from_token(token)
+
+        assert get_conn.call_count == 2
+
+    def test_missing_user_is_not_cached(self):
+        from auth import get_user_from_token
+        token = create_access_token({"user_id": 4})
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchone.return_value = None
+
+        with patch("auth.get_db_connection", return_value=mock_conn) as get_conn:
+            assert get_user_from_token(token) is None
+            assert get_user_from_token(token) is None
+
+        assert get_conn.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# Password reset tokens
+# ---------------------------------------------------------------------------
+
+class TestResetTokens:
+    def test_token_is_stored_as_sha256_digest(self):
+        import hashlib
+        from auth import generate_reset_token
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = iter([
+            MagicMock(with_rows=True, **{"fetchone.return_value": (1,)}),
+            MagicMock(with_rows=False),
+        ])
+
+        with patch("auth.get_db_connection", return_value=mock_conn):
+            result = generate_reset_token("alice@example.com")
+
+        token = result["reset_token"]
+        sql, (email, stored, _) = mock_cursor.execute.call_args.args
+        assert sql.startswith("CALL create_reset_token(")
+        assert email == "alice@example.com"
+        assert stored == hashlib.sha256(token.encode()).digest()
+        # The procedure commits server-side; no separate COMMIT round trip
+        assert mock_cursor.execute.call_count == 1
+        mock_conn.commit.assert_not_called()
+
+    def test_unknown_email_gets_generic_response(self):
+        from auth import generate_reset_token
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.return_value = iter([MagicMock(with_rows=True, **{"fetchone.return_value": (None,)})])
+
+        with patch("auth.get_db_connection", return_value=mock_conn):
+            result = generate_reset_token("nobody@example.com")
+
+        assert result["success"] is True
+        assert "reset_token" not in result
+
+    def test_random_bytes_are_never_reused(self):
+        from auth import _random_bytes, ENTROPY_BUFFER_BYTES
+        chunks = [_random_bytes(32) for _ in range(ENTROPY_BUFFER_BYTES // 32 + 4)]
+        assert all(len(chunk) == 32 for chunk in chunks)
+        assert len(set(chunks)) == len(chunks)
+
+    def test_reset_looks_up_by_digest(self):
+        import hashlib
+        from auth import reset_password
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+
+        with patch("auth.get_db_connection", return_value=mock_conn):
+            result = reset_password("some-token", "newpassword")
+
+        assert result["success"] is False
+        assert mock_cursor.execute.call_args.args[1] == (hashlib.sha256(b"some-token").digest(),)
+
+    def test_expired_reset_link_is_rejected(self):
+        from datetime import datetime, timedelta
+        from auth import reset_password
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        expired = datetime.utcnow() - timedelta(minutes=1)
+        mock_cursor.fetchone.return_value = (1, expired, False)
+
+        with patch("auth.get_db_connection", return_value=mock_conn):
+            result = reset_password("some-token", "newpassword")
+
+        assert result["success"] is False
+        assert "expired" in result["message"]
+        mock_conn.commit.assert_not_called()
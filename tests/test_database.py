@@ -0,0 +1,63 @@
+"""Tests for connection handling in database.py.
+
+mysql.connector is stubbed in conftest.py, so these tests patch the pool
+factory and direct connect to check how get_db_connection uses them.
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+import database
+
+
+class FakePoolError(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def _reset_pool():
+    database._pool = None
+    with patch("database.PoolError", FakePoolError):
+        yield
+    database._pool = None
+
+
+# ---------------------------------------------------------------------------
+# get_db_connection
+# ---------------------------------------------------------------------------
+
+class TestGetDbConnection:
+    def test_pool_is_created_once(self):
+        with patch("database.pooling.MySQLConnectionPool") as make_pool:
+            first = database.get_db_connection()
+            second = database.get_db_connection()
+        assert make_pool.call_count == 1
+        assert make_pool.call_args.kwargs["pool_size"] == database.DB_POOL_SIZE
+        assert first is second is make_pool.return_value.get_connection.return_value
+
+    @pytest.mark.parametrize("configured, expected", [(100, 32), (0, 1)])
+    def test_pool_size_is_clamped_to_connector_limits(self, configured, expected):
+        with patch("database.DB_POOL_SIZE", configured), \
+                patch("database.pooling.MySQLConnectionPool") as make_pool:
+            database.get_db_connection()
+        assert make_pool.call_args.kwargs["pool_size"] == expected
+
+    @pytest.mark.parametrize("use_pure", [False, True])
+    def test_pool_follows_c_extension_availability(self, use_pure):
+        with patch("database.USE_PURE", use_pure), \
+                patch("database.pooling.MySQLConnectionPool") as make_pool:
+            database.get_db_connection()
+        assert make_pool.call_args.kwargs["use_pure"] is use_pure
+
+    def test_exhausted_pool_falls_back_to_direct_connect(self):
+        pool = MagicMock()
+        pool.get_connection.side_effect = FakePoolError("pool exhausted")
+        with patch("database.pooling.MySQLConnectionPool", return_value=pool), \
+                patch("database.mysql.connector.connect") as connect:
+            connection = database.get_db_connection()
+        assert connection is connect.return_value
+
+    def test_pool_creation_failure_returns_none_and_retries(self):
+        with patch("database.pooling.MySQLConnectionPool", side_effect=[database.Error("down"), MagicMock()]) as make_pool:
+            assert database.get_db_connection() is None
+            assert database.get_db_connection() is not None
+        assert make_pool.call_count == 2
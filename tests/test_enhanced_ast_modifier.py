@@ -0,0 +1,308 @@
+"""Tests for the message/response helpers in enhanced_ast_modifier.py.
+
+These cover the pure text-processing paths (intent detection, code
+extraction, syntax-fix heuristics); nothing here calls an LLM.
+"""
+from unittest.mock import patch
+
+import threading
+
+import pytest
+
+from ast_cache_manager import ASTNodeInfo, FileASTInfo
+from enhanced_ast_modifier import _CODE_BLOCK_RE, DynamicASTModifier, TargetRef, _CodeBlockCollector
+
+
+@pytest.fixture(scope="module")
+def modifier():
+    return DynamicASTModifier()
+
+
+def _file_ast(*function_names):
+    functions = [
+        ASTNodeInfo(name, "function", i * 10 + 1, i * 10 + 5, file_path="app.js")
+        for i, name in enumerate(function_names)
+    ]
+    file_hash = "|".join(function_names)
+    return FileASTInfo("app.js", "javascript", file_hash, 0.0, 0.0, functions, [], [], [], 50, 1)
+
+
+# ---------------------------------------------------------------------------
+# Intent detection
+# ---------------------------------------------------------------------------
+
+class TestDetectModificationType:
+    @pytest.mark.parametrize("message, expected", [
+        ("Add a logout button", "add"),
+        ("Please fix the crash", "fix"),
+        ("Update the header colour", "update"),
+        ("Delete the unused helper", "remove"),
+        ("Refactor this module", "refactor"),
+        ("What does this do?", "general"),
+    ])
+    def test_categories(self, modifier, message, expected):
+        assert modifier._detect_modification_type(message) == expected
+
+    def test_earlier_category_wins(self, modifier):
+        # "add" is checked before "fix", wherever the words appear
+        assert modifier._detect_modification_type("fix it and add tests") == "add"
+
+    def test_keywords_match_inside_words(self, modifier):
+        assert modifier._detect_modification_type("the address form") == "add"
+
+
+class TestIsSyntaxErrorFix:
+    def test_detects_syntax_keywords(self, modifier):
+        assert modifier._is_syntax_error_fix("Unexpected identifier on line 3") is True
+        assert modifier._is_syntax_error_fix("missing closing BRACKET") is True
+
+    def test_plain_request_is_not_a_syntax_fix(self, modifier):
+        assert modifier._is_syntax_error_fix("add a footer") is False
+
+
+class TestMessageChecksAreMemoized:
+    def test_repeated_message_hits_the_cache(self, modifier):
+        message = "rename the memoized helper"
+        modifier._detect_modification_type(message)
+        hits = DynamicASTModifier._detect_modification_type.cache_info().hits
+        assert modifier._detect_modification_type(message) == "general"
+        assert DynamicASTModifier._detect_modification_type.cache_info().hits == hits + 1
+
+
+# ---------------------------------------------------------------------------
+# Code extraction
+# ---------------------------------------------------------------------------
+
+class TestExtractCodeFromResponse:
+    def test_extracts_fenced_block(self, modifier):
+        response = "Here you go:\n```python\ndef f():\n    return 1\n```\nDone."
+        assert modifier._extract_code_from_response(response) == "def f():\n    return 1"
+
+    def test_unfenced_code_is_returned_stripped(self, modifier):
+        response = "  def f():\n    return 1\n"
+        assert modifier._extract_code_from_response(response) == "def f():\n    return 1"
+
+    def test_prose_returns_none(self, modifier):
+        assert modifier._extract_code_from_response("No changes are needed.") is None
+
+
+# ---------------------------------------------------------------------------
+# Return placement
+# ---------------------------------------------------------------------------
+
+class TestIsInsideFunction:
+    LINES = [
+        "const App = () => {",
+        "  if (ready) {",
+        "    return (",
+        "  }",
+        "}",
+        "return (",
+    ]
+
+    def test_return_inside_arrow_function(self, modifier):
+        assert modifier._is_inside_function(self.LINES, 2) is True
+
+    def test_return_after_function_closes(self, modifier):
+        assert modifier._is_inside_function(self.LINES, 5) is False
+
+    def test_no_enclosing_function(self, modifier):
+        assert modifier._is_inside_function(["return ("], 0) is False
+
+    def test_precomputed_scan_matches_fresh_scan(self, modifier):
+        scan = modifier._scan_braces(self.LINES)
+        for i in range(len(self.LINES)):
+            assert modifier._is_inside_function(self.LINES, i, scan) == modifier._is_inside_function(self.LINES, i)
+
+    def test_detects_misplaced_return(self, modifier):
+        content = "\n".join(self.LINES)
+        assert modifier._detect_syntax_error_type("Return outside of function", content) == "misplaced_return"
+
+
+class TestFixSyntaxErrorSmart:
+    def test_inserts_missing_closing_brace(self, modifier):
+        content = "const App = () => {\n  const s = {a: 1\n  if (a) { b() }\n  if (c) { d() }\nreturn (\n  <div/>\n);"
+        scan = modifier._scan_syntax(content)
+        fixed = modifier._fix_syntax_error_smart(content, "misplaced_return", "", scan)
+        assert fixed.split("\n")[4] == "  };"
+        assert scan.lines == content.split("\n")
+
+    def test_unchanged_content_is_returned_as_is(self, modifier):
+        content = "const App = () => {\n  return (\n    <div/>\n  );\n}"
+        assert modifier._fix_syntax_error_smart(content, "misplaced_return", "") is content
+
+    def test_skips_scan_without_parenthesized_return(self, modifier):
+        with patch.object(modifier, "_scan_syntax") as scan_syntax:
+            assert modifier._fix_syntax_error_smart("return x;", "misplaced_return", "") == "return x;"
+        scan_syntax.assert_not_called()
+
+    def test_scan_is_reused_for_identical_content(self, modifier):
+        content = "const App = () => {\n  return (\n    <div/>\n  );\n}"
+        first = modifier._get_syntax_scan("src/App.jsx", content)
+        assert modifier._get_syntax_scan("src/App.jsx", content) is first
+        assert modifier._get_syntax_scan("src/App.jsx", content + "\n") is not first
+
+    def test_scan_collects_return_lines(self, modifier):
+        scan = modifier._scan_syntax("a\nreturn 1\nb\nreturn (")
+        assert scan.return_lines == [1, 3]
+
+    def test_scan_lists_each_return_line_once(self, modifier):
+        scan = modifier._scan_syntax("return returnx\n\nx = 1; return")
+        assert scan.return_lines == [0, 2]
+        assert list(scan.line_starts) == [0, 15, 16]
+
+
+# ---------------------------------------------------------------------------
+# Target extraction
+# ---------------------------------------------------------------------------
+
+class TestExtractTargets:
+    def test_matches_function_named_in_message(self, modifier):
+        targets = modifier._extract_targets_from_cached_ast(_file_ast("handleSubmit", "render"), "Fix HANDLESUBMIT please")
+        assert [t.name for t in targets] == ["handleSubmit"]
+        assert targets[0].start_line == 1
+
+    def test_function_hint_targets_every_function(self, modifier):
+        targets = modifier._extract_targets_from_cached_ast(_file_ast("handleSubmit", "render"), "clean up these functions")
+        assert [t.name for t in targets] == ["handleSubmit", "render"]
+
+    def test_no_name_in_message_targets_nothing(self, modifier):
+        assert modifier._extract_targets_from_cached_ast(_file_ast("handleSubmit", "render"), "make it blue") == []
+
+    def test_index_is_built_once_per_file_version(self, modifier):
+        file_ast = _file_ast("handleSubmit", "render", "onClose")
+        first = modifier._get_target_index(file_ast)
+        assert modifier._get_target_index(file_ast) is first
+        assert modifier._get_target_index(_file_ast("handleSubmit")) is not first
+
+    def test_skips_keywords_short_names_and_duplicates(self, modifier):
+        file_ast = _file_ast("if", "go", "render")
+        file_ast.functions.append(file_ast.functions[2])
+        targets = modifier._extract_targets_from_cached_ast(file_ast, "update every method")
+        assert [t.name for t in targets] == ["render"]
+
+
+# ---------------------------------------------------------------------------
+# Prompt context
+# ---------------------------------------------------------------------------
+
+class TestFileAstContext:
+    def test_lists_functions(self, modifier):
+        context = modifier._build_file_ast_context(_file_ast("handleSubmit", "render"))
+        assert "Functions (2):" in context
+        assert "  - render()" in context.split("\n")
+
+    def test_context_is_built_once_per_file_version(self, modifier):
+        file_ast = _file_ast("openModal", "closeModal")
+        with patch.object(modifier, "_iter_file_ast_context", wraps=modifier._iter_file_ast_context) as build:
+            first = modifier._build_file_ast_context(file_ast)
+            assert modifier._build_file_ast_context(file_ast) is first
+        assert build.call_count == 1
+
+    def test_element_context_is_cached(self, modifier):
+        file_ast = _file_ast("openDrawer", "closeDrawer")
+        element = file_ast.functions[1]
+        with patch.object(modifier, "_format_modification_context", return_value="ctx") as build:
+            assert modifier._build_modification_context(element, file_ast) == "ctx"
+            assert modifier._build_modification_context(element, file_ast) == "ctx"
+        assert build.call_count == 1
+
+    def test_truncates_long_function_lists(self, modifier, monkeypatch):
+        monkeypatch.setattr("enhanced_ast_modifier.MAX_CONTEXT_FUNCTIONS", 2)
+        lines = modifier._build_file_ast_context(_file_ast("alpha", "beta", "gamma", "delta")).split("\n")
+        assert "  - gamma()" not in lines
+        assert lines[-1] == "  ... (2 more)"
+
+
+# ---------------------------------------------------------------------------
+# Applying section edits
+# ---------------------------------------------------------------------------
+
+class TestApplyCachedAstModifications:
+    CONTENT = "function a() {\n  return 1;\n}\n\nfunction b() {\n  return 2;\n}\n"
+
+    def _apply(self, modifier, targets, rewrite):
+        analysis = {"targets": targets, "modification_type": "update"}
+        with patch.object(modifier, "_generate_section_modification_with_context",
+                          side_effect=lambda section, *args: rewrite(section)):
+            return modifier._apply_cached_ast_modifications(self.CONTENT, _file_ast(), analysis, "msg", lambda *a: None)
+
+    @staticmethod
+    def _target(name, start_line, end_line):
+        return TargetRef("function", name, start_line, end_line, None, None, None, "app.js")
+
+    def test_replaces_each_target_section(self, modifier):
+        result = self._apply(
+            modifier,
+            [self._target("a", 1, 3), self._target("b", 5, 7)],
+            lambda section: section.replace("return", "yield"),
+        )
+        assert result["modified_content"] == self.CONTENT.replace("return", "yield")
+        assert result["targets_modified"] == 2
+
+    def test_sections_can_change_line_count(self, modifier):
+        result = self._apply(
+            modifier,
+            [self._target("a", 1, 3)],
+            lambda section: "const a = () => 1;",
+        )
+        assert result["modified_content"] == "const a = () => 1;\n\nfunction b() {\n  return 2;\n}\n"
+
+    def test_overlapping_target_is_skipped(self, modifier):
+        result = self._apply(
+            modifier,
+            [self._target("outer", 1, 7), self._target("inner", 2, 2)],
+            lambda section: section.upper(),
+        )
+        assert result["modified_content"] == self.CONTENT.rstrip("\n").upper() + "\n"
+        assert result["changes"] == ["Modified function 'outer' at line 1"]
+
+
+class TestGenerateSections:
+    def test_worker_progress_is_streamed_from_calling_thread(self, modifier):
+        planned = [(None, 0, 0, n) for n in ("a", "b", "c")]
+        seen = []
+
+        def generate(section, target, user_message, file_ast, stream):
+            stream("llm_call", section)
+            return section.upper()
+
+        def stream(message_type, content):
+            seen.append((content, threading.current_thread() is threading.main_thread()))
+
+        with patch.object(modifier, "_generate_section_modification_with_context", side_effect=generate):
+            results = modifier._generate_sections(planned, "msg", None, stream)
+
+        assert results == ["A", "B", "C"]
+        assert sorted(seen) == [("a", True), ("b", True), ("c", True)]
+
+
+class TestCodeBlockCollector:
+    def test_captures_block_split_across_chunks(self):
+        collector = _CodeBlockCollector()
+        chunks = ["Sure:\n``", "`js\nconst a = 1;\n", "const b = 2;\n`", "``\nMore prose"]
+        done = [collector.feed(chunk) for chunk in chunks]
+        assert done == [False, False, False, True]
+        assert collector.code == "const a = 1;\nconst b = 2;"
+
+    def test_matches_full_response_extraction(self, modifier):
+        response = "Intro with `inline` code\n```python\nx = 1\n```\n```\ny = 2\n```"
+        collector = _CodeBlockCollector()
+        for i in range(0, len(response), 3):
+            collector.feed(response[i:i + 3])
+        assert collector.code == modifier._extract_code_from_response(response)
+
+    def test_backticks_outside_fences_do_not_rescan(self):
+        body = "".join(f"const s{i} = `${{a}}-${{b}}`;\n" for i in range(200))
+        response = f"Here you go:\n```js\n{body}```\nDone"
+        collector = _CodeBlockCollector()
+        with patch("enhanced_ast_modifier._CODE_BLOCK_RE", wraps=_CODE_BLOCK_RE) as pattern:
+            for i in range(0, len(response), 7):
+                collector.feed(response[i:i + 7])
+        assert collector.code == body.rstrip("\n")
+        assert pattern.search.call_count <= 2
+
+    def test_falls_back_to_response_without_block(self, modifier):
+        collector = _CodeBlockCollector()
+        collector.feed("def f():\n    return 1\n")
+        assert modifier._code_from_stream(collector, "def f():\n    return 1\n") == "def f():\n    return 1"
@@ -178,3 +178,30 @@ class TestMCPEndpoints:
         assert "tools" in data
         assert isinstance(data["tools"], list)
         assert len(data["tools"]) > 0
+
+
+# ---------------------------------------------------------------------------
+# Code assistant chat history
+# ---------------------------------------------------------------------------
+
+class TestCodeAssistantHistory:
+    def test_exchange_is_saved_in_one_batch(self, client, sample_project):
+        from unittest.mock import AsyncMock, patch
+        project_id = _load_project(sample_project)
+        try:
+            with patch("routes.projects.get_user_from_token", return_value={"id": 7}), \
+                 patch("routes.projects.detect_user_intent_and_respond",
+                       new=AsyncMock(return_value={"success": True, "explanation": "done"})), \
+                 patch("routes.projects.save_chat_messages_to_db") as save_many:
+                response = client.post(
+                    f"/api/projects/{project_id}/enhanced-code-assistant",
+                    json={"project_id": project_id, "message": "add a footer"},
+                    headers={"Authorization": "Bearer t"},
+                )
+        finally:
+            _remove_project(project_id)
+
+        assert response.status_code == 200
+        save_many.assert_called_once()
+        messages = save_many.call_args.args[3]
+        assert [(m["sender"], m["message"]) for m in messages] == [("user", "add a footer"), ("assistant", "done")]
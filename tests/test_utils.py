@@ -1,7 +1,7 @@
 """Tests for utility functions in utils/file_ops.py."""
 import pytest
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 from store import projects_store
 
@@ -144,3 +144,34 @@ class TestScanProjectsDirectory:
         with patch("utils.file_ops.PROJECTS_DIR", missing_dir):
             result = await scan_projects_directory()
         assert result["projects"] == []
+
+
+# ---------------------------------------------------------------------------
+# save_chat_messages_to_db
+# ---------------------------------------------------------------------------
+
+class TestSaveChatMessages:
+    def test_rows_are_written_with_one_executemany(self):
+        from utils.file_ops import save_chat_messages_to_db
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value
+
+        with patch("database.get_db_connection", return_value=mock_conn):
+            saved = save_chat_messages_to_db(1, "proj-1", "demo", [
+                {"message": "hi", "sender": "user"},
+                {"message": "hello", "sender": "assistant", "metadata": {"success": True}},
+            ])
+
+        assert saved is True
+        rows = mock_cursor.executemany.call_args.args[1]
+        assert rows == [
+            (1, "proj-1", "demo", "hi", "user", "text", None),
+            (1, "proj-1", "demo", "hello", "assistant", "text", '{"success": true}'),
+        ]
+        mock_conn.commit.assert_called_once()
+
+    def test_single_message_helper_delegates(self):
+        from utils.file_ops import save_chat_message_to_db
+        with patch("utils.file_ops.save_chat_messages_to_db", return_value=True) as save_many:
+            assert save_chat_message_to_db(1, "proj-1", "demo", "hi", "user") is True
+        assert save_many.call_args.args[3][0]["message"] == "hi"
@@ -275,10 +275,11 @@ async def scan_projects_directory() -> dict:
 # Chat history (DB)
 # ---------------------------------------------------------------------------
 
-def save_chat_message_to_db(user_id: int, project_id: str, project_name: str,
-                             message: str, sender: str, message_type: str = 'text',
-                             metadata: dict = None):
-    """Save a chat message to database"""
+def save_chat_messages_to_db(user_id: int, project_id: str, project_name: str, messages: list):
+    """Save several chat messages in one batched INSERT.
+
+    Each message is a dict with 'message', 'sender' and optional 'message_type'/'metadata'.
+    """
     try:
         from database import get_db_connection
 
@@ -288,13 +289,19 @@ def save_chat_message_to_db(user_id: int, project_id: str, project_name: str,
 
         cursor = connection.cursor()
 
-        metadata_json = json.dumps(metadata) if metadata else None
+        rows = [
+            (user_id, project_id, project_name, msg['message'], msg['sender'],
+             msg.get('message_type', 'text'),
+             json.dumps(msg['metadata']) if msg.get('metadata') else None)
+            for msg in messages
+        ]
 
-        cursor.execute("""
+        # executemany sends the rows as a single multi-row INSERT
+        cursor.executemany("""
             INSERT INTO code_assistant_history
             (user_id, project_id, project_name, message, sender, message_type, metadata)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (user_id, project_id, project_name, message, sender, message_type, metadata_json))
+        """, rows)
 
         connection.commit()
         cursor.close()
@@ -303,10 +310,22 @@ def save_chat_message_to_db(user_id: int, project_id: str, project_name: str,
         return True
 
     except Exception as e:
-        print(f"[ERROR] Failed to save chat message: {e}")
+        print(f"[ERROR] Failed to save chat messages: {e}")
         return False
 
 
+def save_chat_message_to_db(user_id: int, project_id: str, project_name: str,
+                             message: str, sender: str, message_type: str = 'text',
+                             metadata: dict = None):
+    """Save a chat message to database"""
+    return save_chat_messages_to_db(user_id, project_id, project_name, [{
+        'message': message,
+        'sender': sender,
+        'message_type': message_type,
+        'metadata': metadata,
+    }])
+
+
 async def get_chat_history_from_db(user_id: int, project_id: str, limit: int = 50):
     """Get chat history for a project"""
     try:
@@ -322,7 +341,7 @@ async def get_chat_history_from_db(user_id: int, project_id: str, limit: int = 5
             SELECT id, message, sender, message_type, metadata, created_at, project_id
             FROM code_assistant_history
             WHERE user_id = %s AND project_id = %s
-            ORDER BY created_at DESC
+            ORDER BY created_at DESC, id DESC
             LIMIT %s
         """, (user_id, project_id, limit))
 